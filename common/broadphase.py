@@ -0,0 +1,136 @@
+
+# Uniform grid broadphase for axis-aligned rects (x, y, w, h)
+#
+# Rects are bucketed into square cells; queries return only the rects whose
+# cells overlap the query area, in insertion order, so callers can run their
+# exact narrowphase test on a handful of candidates instead of every wall.
+#
+# Derived per-rect data is computed once at insert time: ``bounds`` holds
+# (xmin, ymin, xmax, ymax) tuples and ``boxes`` the same values as an (N, 4)
+# NumPy array when NumPy is available.
+
+from math import inf
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; ``boxes`` is then None
+    np = None
+
+class UniformGrid:
+    def __init__(self, rects=(), cell=128, min_items=8):
+        self.cell = cell
+        # Below this many rects a full scan is cheaper than hashing cells
+        self.min_items = min_items
+        self.rects = []
+        self.bounds = []
+        self.cells = {}
+        self._boxes = None
+        for rect in rects:
+            self.insert(rect)
+
+    def __len__(self):
+        return len(self.rects)
+
+    @property
+    def boxes(self):
+        if self._boxes is None and np is not None:
+            self._boxes = np.array(self.bounds, dtype=np.float64).reshape(-1, 4)
+        return self._boxes
+
+    def insert(self, rect):
+        rect = tuple(rect)
+        idx = len(self.rects)
+        self.rects.append(rect)
+        rx, ry, rw, rh = rect
+        self.bounds.append((rx, ry, rx + rw, ry + rh))
+        self._boxes = None
+        c = self.cell
+        cells = self.cells
+        for cx in range(int(rx // c), int((rx + rw) // c) + 1):
+            for cy in range(int(ry // c), int((ry + rh) // c) + 1):
+                bucket = cells.get((cx, cy))
+                if bucket is None:
+                    cells[(cx, cy)] = [idx]
+                else:
+                    bucket.append(idx)
+        return idx
+
+    def query_rect_ids(self, x, y, w, h):
+        if len(self.rects) <= self.min_items:
+            return list(range(len(self.rects)))
+        c = self.cell
+        cells = self.cells
+        ids = set()
+        for cx in range(int(x // c), int((x + w) // c) + 1):
+            for cy in range(int(y // c), int((y + h) // c) + 1):
+                bucket = cells.get((cx, cy))
+                if bucket:
+                    ids.update(bucket)
+        return sorted(ids)
+
+    def query_segment_ids(self, x0, y0, x1, y1):
+        # Amanatides-Woo traversal of the cells the segment passes through.
+        # When the segment crosses a cell corner (to within rounding), both
+        # neighbouring cells are visited so grazing contacts are never missed.
+        if len(self.rects) <= self.min_items:
+            return list(range(len(self.rects)))
+        c = self.cell
+        cells = self.cells
+        cx, cy = int(x0 // c), int(y0 // c)
+        ex, ey = int(x1 // c), int(y1 // c)
+        dx = x1 - x0; dy = y1 - y0
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        if dx:
+            t_max_x = ((cx + (step_x > 0)) * c - x0) / dx
+            t_delta_x = c / abs(dx)
+        else:
+            t_max_x = t_delta_x = inf
+        if dy:
+            t_max_y = ((cy + (step_y > 0)) * c - y0) / dy
+            t_delta_y = c / abs(dy)
+        else:
+            t_max_y = t_delta_y = inf
+        ids = set()
+        bucket = cells.get((cx, cy))
+        if bucket:
+            ids.update(bucket)
+        for _ in range(abs(ex - cx) + abs(ey - cy)):
+            if t_max_x < t_max_y - 1e-9:
+                cx += step_x; t_max_x += t_delta_x
+            elif t_max_y < t_max_x - 1e-9:
+                cy += step_y; t_max_y += t_delta_y
+            else:
+                for key in ((cx + step_x, cy), (cx, cy + step_y)):
+                    bucket = cells.get(key)
+                    if bucket:
+                        ids.update(bucket)
+                cx += step_x; t_max_x += t_delta_x
+                cy += step_y; t_max_y += t_delta_y
+            bucket = cells.get((cx, cy))
+            if bucket:
+                ids.update(bucket)
+            if cx == ex and cy == ey:
+                break
+        else:
+            # Rounding can leave the walk one cell short of an end point that
+            # sits on a cell line
+            bucket = cells.get((ex, ey))
+            if bucket:
+                ids.update(bucket)
+        return sorted(ids)
+
+    def query_rect(self, x, y, w, h):
+        if len(self.rects) <= self.min_items:
+            return self.rects
+        rects = self.rects
+        return [rects[i] for i in self.query_rect_ids(x, y, w, h)]
+
+    def query_segment(self, x0, y0, x1, y1):
+        if len(self.rects) <= self.min_items:
+            return self.rects
+        rects = self.rects
+        return [rects[i] for i in self.query_segment_ids(x0, y0, x1, y1)]
+
+    def query_ray(self, ox, oy, dirx, diry, max_dist):
+        return self.query_segment(ox, oy, ox + dirx * max_dist, oy + diry * max_dist)
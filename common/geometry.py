@@ -1,11 +1,39 @@
 
-# Minimal geometry helpers auto-installed by Stealth Golf
+# Geometry helpers shared by the game and the level editor
+#
+# NumPy and Numba are optional accelerators, never requirements.  The
+# pure-Python scalar code (ray_rect_nearest_hit and the fallback loop in
+# cast_rays) is the reference; test_geometry.py holds the NumPy and Numba
+# paths to it.
+
+from math import hypot, inf
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; every helper has a scalar path
+    np = None
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; cast_rays then uses NumPy or pure Python
+    njit = None
+
+__all__ = [
+    "clamp",
+    "length",
+    "normalize",
+    "seg_intersect",
+    "ray_rect_nearest_hit",
+    "los_blocked",
+    "cast_rays",
+    "rect_in_view",
+]
 
 def clamp(v, lo, hi):
     return lo if v < lo else hi if v > hi else v
 
 def length(vx, vy):
-    return (vx * vx + vy * vy) ** 0.5
+    return hypot(vx, vy)
 
 def normalize(vx, vy):
     l = length(vx, vy)
@@ -24,34 +52,165 @@ def seg_intersect(p1, p2, p3, p4):
     return (False, 0, 0, 0, 0)
 
 def ray_rect_nearest_hit(ox, oy, dirx, diry, rect):
+    # Slab test: the ray enters the rect at the largest near-plane t and
+    # leaves at the smallest far-plane t.  From inside the rect the nearest
+    # edge hit is the exit point.
     rx, ry, rw, rh = rect
-    farx = ox + dirx * 99999
-    fary = oy + diry * 99999
-    best_t = None
-    best_pt = None
-    edges = [
-        ((rx, ry), (rx + rw, ry)),
-        ((rx + rw, ry), (rx + rw, ry + rh)),
-        ((rx + rw, ry + rh), (rx, ry + rh)),
-        ((rx, ry + rh), (rx, ry)),
-    ]
-    for a, b in edges:
-        hit, t, u, ix, iy = seg_intersect((ox, oy), (farx, fary), a, b)
-        if hit and (best_t is None or t < best_t):
-            best_t = t
-            best_pt = (ix, iy)
-    return best_pt
+    if dirx:
+        t_lo = (rx - ox) / dirx; t_hi = (rx + rw - ox) / dirx
+        if t_lo > t_hi:
+            t_lo, t_hi = t_hi, t_lo
+    elif rx <= ox <= rx + rw and diry:
+        t_lo, t_hi = -inf, inf
+    else:
+        return None
+    if diry:
+        t1 = (ry - oy) / diry; t2 = (ry + rh - oy) / diry
+        if t1 > t2:
+            t1, t2 = t2, t1
+        if t1 > t_lo:
+            t_lo = t1
+        if t2 < t_hi:
+            t_hi = t2
+    elif not ry <= oy <= ry + rh:
+        return None
+    if t_lo > t_hi or t_hi < 0:
+        return None
+    t = t_lo if t_lo >= 0 else t_hi
+    return (ox + dirx * t, oy + diry * t)
 
 def los_blocked(ox, oy, tx, ty, walls):
+    # Slab test: clip the segment's parameter range against each rect's x and
+    # y slabs.  The segment is blocked when it enters or leaves a rect at some
+    # 0 < t < 1, i.e. when it crosses one of the rect's edges.
+    # Divide rather than multiply by a precomputed reciprocal: the rounding
+    # of 1/dx can push t_lo one ulp past t_hi when the segment touches a
+    # corner exactly, which would stop it counting as blocked
+    dx = tx - ox; dy = ty - oy
+    t_end = 1 - 1e-6
+    sx0, sx1 = (ox, tx) if ox < tx else (tx, ox)
+    sy0, sy1 = (oy, ty) if oy < ty else (ty, oy)
     for rx, ry, rw, rh in walls:
-        edges = [
-            ((rx, ry), (rx + rw, ry)),
-            ((rx + rw, ry), (rx + rw, ry + rh)),
-            ((rx + rw, ry + rh), (rx, ry + rh)),
-            ((rx, ry + rh), (rx, ry)),
-        ]
-        for a, b in edges:
-            hit, t, u, ix, iy = seg_intersect((ox, oy), (tx, ty), a, b)
-            if hit and 0 < t < 1 - 1e-6:
-                return True
+        # Cheap reject: rect and segment bounding boxes don't overlap
+        if rx > sx1 or rx + rw < sx0 or ry > sy1 or ry + rh < sy0:
+            continue
+        if dx:
+            t_lo = (rx - ox) / dx; t_hi = (rx + rw - ox) / dx
+            if t_lo > t_hi:
+                t_lo, t_hi = t_hi, t_lo
+        elif rx <= ox <= rx + rw:
+            t_lo, t_hi = -1.0, 2.0
+        else:
+            continue
+        if dy:
+            t1 = (ry - oy) / dy; t2 = (ry + rh - oy) / dy
+            if t1 > t2:
+                t1, t2 = t2, t1
+            if t1 > t_lo:
+                t_lo = t1
+            if t2 < t_hi:
+                t_hi = t2
+        elif not ry <= oy <= ry + rh:
+            continue
+        if t_lo <= t_hi and (0 < t_lo < t_end or 0 < t_hi < t_end):
+            return True
     return False
+
+def rect_in_view(rect, view):
+    # Closed overlap of an (x, y, w, h) rect with a (xmin, ymin, xmax, ymax) view
+    rx, ry, rw, rh = rect
+    return rx <= view[2] and ry <= view[3] and rx + rw >= view[0] and ry + rh >= view[1]
+
+def cast_rays(ox, oy, dirs_x, dirs_y, max_dist, rects, boxes=None):
+    # Nearest rect hit along each unit direction, clipped to max_dist.
+    # Returns one (x, y) point per ray.  ``boxes`` optionally supplies the
+    # rects as a precomputed (N, 4) array of (xmin, ymin, xmax, ymax).
+    if np is not None and len(rects):
+        if boxes is None:
+            r = np.asarray(rects, dtype=np.float64)
+            boxes = np.concatenate((r[:, :2], r[:, :2] + r[:, 2:]), axis=1)
+        if _cast_rays_jit is not None:
+            dx = np.asarray(dirs_x, dtype=np.float64)
+            dy = np.asarray(dirs_y, dtype=np.float64)
+            out = np.empty((len(dx), 2))
+            _cast_rays_jit(float(ox), float(oy), dx, dy, float(max_dist), np.ascontiguousarray(boxes, dtype=np.float64), out)
+            return list(zip(out[:, 0].tolist(), out[:, 1].tolist()))
+        return _cast_rays_np(ox, oy, dirs_x, dirs_y, max_dist, boxes)
+    max_d2 = max_dist * max_dist
+    pts = []
+    for dx, dy in zip(dirs_x, dirs_y):
+        hit_pt = None
+        nearest_d2 = max_d2
+        for rect in rects:
+            pt = ray_rect_nearest_hit(ox, oy, dx, dy, rect)
+            if pt is not None:
+                hx = pt[0] - ox; hy = pt[1] - oy
+                d2 = hx * hx + hy * hy
+                if d2 <= nearest_d2:
+                    nearest_d2 = d2
+                    hit_pt = pt
+        pts.append(hit_pt if hit_pt is not None else (ox + dx * max_dist, oy + dy * max_dist))
+    return pts
+
+def _cast_rays_np(ox, oy, dirs_x, dirs_y, max_dist, boxes):
+    # Same slab test as ray_rect_nearest_hit, broadcast over (rays, rects)
+    xmin = boxes[:, 0]; ymin = boxes[:, 1]
+    xmax = boxes[:, 2]; ymax = boxes[:, 3]
+    dx = np.asarray(dirs_x, dtype=np.float64)[:, None]
+    dy = np.asarray(dirs_y, dtype=np.float64)[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tx1 = (xmin - ox) / dx; tx2 = (xmax - ox) / dx
+        ty1 = (ymin - oy) / dy; ty2 = (ymax - oy) / dy
+    # A ray parallel to an axis is inside that slab for its whole length or never
+    in_x = np.where((xmin <= ox) & (ox <= xmax), -inf, inf)
+    in_y = np.where((ymin <= oy) & (oy <= ymax), -inf, inf)
+    t_lo = np.maximum(
+        np.where(dx == 0, in_x, np.minimum(tx1, tx2)),
+        np.where(dy == 0, in_y, np.minimum(ty1, ty2)),
+    )
+    t_hi = np.minimum(
+        np.where(dx == 0, -in_x, np.maximum(tx1, tx2)),
+        np.where(dy == 0, -in_y, np.maximum(ty1, ty2)),
+    )
+    t = np.where(t_lo >= 0, t_lo, t_hi)
+    t = np.where((t_lo <= t_hi) & (t_hi >= 0), t, max_dist).min(axis=1)
+    np.minimum(t, max_dist, out=t)
+    dx = dx[:, 0]; dy = dy[:, 0]
+    return list(zip((ox + dx * t).tolist(), (oy + dy * t).tolist()))
+
+def _cast_rays_kernel(ox, oy, dirs_x, dirs_y, max_dist, boxes, out):
+    # Scalar slab test over (rays, rects) writing hit points into ``out``;
+    # only used compiled, where the plain loops run at native speed.
+    for i in range(dirs_x.shape[0]):
+        dx = dirs_x[i]; dy = dirs_y[i]
+        best = max_dist
+        for j in range(boxes.shape[0]):
+            xmin = boxes[j, 0]; ymin = boxes[j, 1]
+            xmax = boxes[j, 2]; ymax = boxes[j, 3]
+            if dx != 0.0:
+                t_lo = (xmin - ox) / dx; t_hi = (xmax - ox) / dx
+                if t_lo > t_hi:
+                    t_lo, t_hi = t_hi, t_lo
+            elif xmin <= ox and ox <= xmax:
+                t_lo = -inf; t_hi = inf
+            else:
+                continue
+            if dy != 0.0:
+                t1 = (ymin - oy) / dy; t2 = (ymax - oy) / dy
+                if t1 > t2:
+                    t1, t2 = t2, t1
+                if t1 > t_lo:
+                    t_lo = t1
+                if t2 < t_hi:
+                    t_hi = t2
+            elif not (ymin <= oy and oy <= ymax):
+                continue
+            if t_lo > t_hi or t_hi < 0.0:
+                continue
+            t = t_lo if t_lo >= 0.0 else t_hi
+            if t < best:
+                best = t
+        out[i, 0] = ox + dx * best
+        out[i, 1] = oy + dy * best
+
+_cast_rays_jit = njit(cache=True)(_cast_rays_kernel) if njit is not None else None
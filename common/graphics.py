@@ -0,0 +1,45 @@
+
+# Kivy drawing helpers shared by the game and the level editor
+
+from kivy.graphics.texture import Texture
+
+try:
+    from kivy.graphics.opengl_utils import gl_has_capability, GLCAP_NPOT
+except ImportError:  # very old Kivy: assume NPOT textures are unsupported
+    gl_has_capability = None
+
+__all__ = [
+    "grid_texture",
+]
+
+def _npot_supported():
+    try:
+        return bool(gl_has_capability and gl_has_capability(GLCAP_NPOT))
+    except Exception:
+        return False
+
+def grid_texture(step, line_width, bg, line):
+    # One step x step grid cell: ``bg`` with a ``line_width`` px line of
+    # ``line`` along its left and bottom edges (RGBA bytes), set to repeat
+    # so one quad with uvsize = world / step tiles the whole grid.
+    #
+    # GLES2 only guarantees wrap='repeat' for power-of-two textures.  Without
+    # NPOT support the cell is resampled into the next power-of-two size
+    # instead; one repeat still spans one cell, so uvsize is unchanged, but
+    # at fractional camera offsets line edges can shift by up to a pixel.
+    size = step
+    if step & (step - 1) and not _npot_supported():
+        size = 1 << (step - 1).bit_length()
+    bg = bytes(bg); line = bytes(line)
+    # Texel centres mapped back to the cell's pixel columns/rows
+    src = [int((i + 0.5) * step / size) for i in range(size)]
+    buf = bytearray()
+    for y in range(size):
+        row_line = src[y] < line_width
+        for x in range(size):
+            buf += line if row_line or src[x] < line_width else bg
+    tex = Texture.create(size=(size, size), colorfmt="rgba")
+    tex.blit_buffer(bytes(buf), colorfmt="rgba", bufferfmt="ubyte")
+    tex.wrap = "repeat"
+    tex.mag_filter = "nearest"; tex.min_filter = "nearest"
+    return tex
@@ -3,115 +3,19 @@
 # 1) low-speed damping ("tiny cap"): quickly but smoothly halts slow rolls
 # 2) auto-load next level up to 18: tries stealth_level_{n}.json, level_{n}.json, then .py
 #
-import json, os, sys, runpy
+import json, os, re, sys
 from math import sin, cos, atan2, sqrt, radians, pi
 from array import array
+from functools import lru_cache
 from kivy.app import App
 from kivy.clock import Clock
 from kivy.core.window import Window
-from kivy.graphics import Color, Ellipse, Rectangle, Line, Triangle, PushMatrix, PopMatrix, Translate, Mesh
+from kivy.graphics import Canvas, Color, Ellipse, Rectangle, Line, Triangle, PushMatrix, PopMatrix, Translate, Mesh
 from kivy.uix.widget import Widget
 from kivy.uix.label import Label
-# Ensure ``common.geometry`` is available.  If the package is missing, a
-# minimal copy of the helpers is written to ``common/geometry.py`` and then
-# imported.  This allows the game to start even when the supporting package
-# wasn't shipped alongside the script.
-def _ensure_geometry():
-    try:
-        from common.geometry import (
-            clamp,
-            length,
-            normalize,
-            seg_intersect,
-            ray_rect_nearest_hit,
-            los_blocked,
-        )
-        return clamp, length, normalize, seg_intersect, ray_rect_nearest_hit, los_blocked
-    except ModuleNotFoundError:
-        import importlib.util, os, textwrap
-
-        geom_src = textwrap.dedent(
-            '''
-            # Minimal geometry helpers auto-installed by Stealth Golf
-
-            def clamp(v, lo, hi):
-                return lo if v < lo else hi if v > hi else v
-
-            def length(vx, vy):
-                return (vx * vx + vy * vy) ** 0.5
-
-            def normalize(vx, vy):
-                l = length(vx, vy)
-                return (0.0, 0.0) if l == 0 else (vx / l, vy / l)
-
-            def seg_intersect(p1, p2, p3, p4):
-                x1, y1 = p1; x2, y2 = p2; x3, y3 = p3; x4, y4 = p4
-                den = (x1 - x2) * (y3 - y4) - (y1 - y2) * (x3 - x4)
-                if abs(den) < 1e-9:
-                    return (False, 0, 0, 0, 0)
-                t = ((x1 - x3) * (y3 - y4) - (y1 - y3) * (x3 - x4)) / den
-                u = ((x1 - x3) * (y1 - y2) - (y1 - y3) * (x1 - x2)) / den
-                if 0 <= t <= 1 and 0 <= u <= 1:
-                    ix = x1 + t * (x2 - x1); iy = y1 + t * (y2 - y1)
-                    return (True, t, u, ix, iy)
-                return (False, 0, 0, 0, 0)
-
-            def ray_rect_nearest_hit(ox, oy, dirx, diry, rect):
-                rx, ry, rw, rh = rect
-                farx = ox + dirx * 99999
-                fary = oy + diry * 99999
-                best_t = None
-                best_pt = None
-                edges = [
-                    ((rx, ry), (rx + rw, ry)),
-                    ((rx + rw, ry), (rx + rw, ry + rh)),
-                    ((rx + rw, ry + rh), (rx, ry + rh)),
-                    ((rx, ry + rh), (rx, ry)),
-                ]
-                for a, b in edges:
-                    hit, t, u, ix, iy = seg_intersect((ox, oy), (farx, fary), a, b)
-                    if hit and (best_t is None or t < best_t):
-                        best_t = t
-                        best_pt = (ix, iy)
-                return best_pt
-
-            def los_blocked(ox, oy, tx, ty, walls):
-                for rx, ry, rw, rh in walls:
-                    edges = [
-                        ((rx, ry), (rx + rw, ry)),
-                        ((rx + rw, ry), (rx + rw, ry + rh)),
-                        ((rx + rw, ry + rh), (rx, ry + rh)),
-                        ((rx, ry + rh), (rx, ry)),
-                    ]
-                    for a, b in edges:
-                        hit, t, u, ix, iy = seg_intersect((ox, oy), (tx, ty), a, b)
-                        if hit and 0 < t < 1 - 1e-6:
-                            return True
-                return False
-            '''
-        )
-
-        os.makedirs("common", exist_ok=True)
-        init_path = os.path.join("common", "__init__.py")
-        if not os.path.exists(init_path):
-            open(init_path, "w").close()
-        geom_path = os.path.join("common", "geometry.py")
-        with open(geom_path, "w", encoding="utf-8") as f:
-            f.write(geom_src)
-
-        spec = importlib.util.spec_from_file_location("common.geometry", geom_path)
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        return (
-            module.clamp,
-            module.length,
-            module.normalize,
-            module.seg_intersect,
-            module.ray_rect_nearest_hit,
-            module.los_blocked,
-        )
-
-clamp, length, normalize, seg_intersect, ray_rect_nearest_hit, los_blocked = _ensure_geometry()
+from common.geometry import clamp, length, normalize, los_blocked, cast_rays, rect_in_view
+from common.graphics import grid_texture
+from common.broadphase import UniformGrid
 
 # Try not to crash if Window isn't available (e.g., packaging env)
 try:
@@ -122,6 +26,8 @@ except Exception:
 # --------------------------------- Config ------------------------------------
 LEVEL_CANDIDATES = ["stealth_level.json", "level.json"]  # initial
 MAX_LEVEL_INDEX = 18
+GRID_CELL = 60  # background grid spacing (px)
+CULL_CELL = 256  # static layers are culled to the camera snapped to this (px)
 
 # Low-speed damping (tiny cap): below this speed, apply extra damping so ball stops soon
 LOW_SPEED_THRESHOLD = 140.0  # px/s
@@ -155,27 +61,72 @@ def _search_paths(names):
             out.append(os.path.join(script_dir, name))
     return out
 
+@lru_cache(maxsize=None)
+def _dir_files(dirpath):
+    # One listing per directory; level files don't appear while the game runs
+    try:
+        return frozenset(os.listdir(dirpath))
+    except OSError:
+        return frozenset()
+
 def _find_first_existing(names):
     for p in _search_paths(names):
-        if os.path.exists(p):
+        dirpath, name = os.path.split(p)
+        if name in _dir_files(dirpath or os.curdir):
             return p
     return None
 
 def _find_initial_level():
     return _find_first_existing(LEVEL_CANDIDATES)
 
+_LEVEL_IDX_RE = re.compile(r'_(\d+)\.(?:json|py)$')
+
 def _extract_index_from_name(path):
     # Find trailing _N before extension; return int or 1 if none
-    import re, os
     base = os.path.basename(path or "")
-    m = re.search(r'_(\d+)\.(?:json|py)$', base)
+    m = _LEVEL_IDX_RE.search(base)
     if m: 
         try: return int(m.group(1))
         except: pass
     return 1
 
 # ------------------------------- Game Model ----------------------------------
+def _resolve_collisions(x, y, vx, vy, r, bounds):
+    # Push a circle out of axis-aligned boxes, given as precomputed
+    # (xmin, ymin, xmax, ymax) tuples, and reflect its velocity.
+    # Works on plain locals and returns the updated (x, y, vx, vy) so the
+    # per-wall loop does no attribute reads/writes on the Ball.  clamp() and
+    # normalize() are inlined since this runs per collider per frame.  It
+    # stays plain Python even though NumPy/Numba may be installed: with a few
+    # dozen colliders a frame, JIT warm-up and array dispatch would not pay.
+    r2 = r * r
+    for rx, ry, rxw, ryh in bounds:
+        closest_x = rx if x < rx else rxw if x > rxw else x
+        closest_y = ry if y < ry else ryh if y > ryh else y
+        dx = x - closest_x; dy = y - closest_y
+        d2 = dx*dx + dy*dy
+        if d2 < r2:
+            if d2 == 0.0:
+                # Center inside the rect: push out through the nearest side
+                left = abs(x - rx); right = abs(rxw - x)
+                bottom = abs(y - ry); top = abs(ryh - y)
+                m = min(left, right, bottom, top)
+                px, py = (-(r),0) if m==left else ((r),0) if m==right else (0, -(r)) if m==bottom else (0, r)
+                x += px; y += py
+            else:
+                d = d2 ** 0.5
+                nx, ny = dx/d, dy/d  # already unit length
+                push = r - d
+                x += nx*push; y += ny*push
+                vn = vx*nx + vy*ny
+                if vn < 0:
+                    vx -= 1.8 * vn * nx
+                    vy -= 1.8 * vn * ny
+    return x, y, vx, vy
+
 class Ball:
+    __slots__ = ('x', 'y', 'vx', 'vy', 'r', 'color', 'smoke_timer', 'in_motion')
+
     def __init__(self, x, y, r=14, color=(0.95, 0.95, 0.95, 1)):
         self.x, self.y = x, y
         self.vx, self.vy = 0.0, 0.0
@@ -187,39 +138,20 @@ class Ball:
     def apply_impulse(self, ix, iy):
         self.vx += ix; self.vy += iy; self.in_motion = True
 
-    def update(self, dt, colliders):
-        # Integrate
-        self.x += self.vx * dt; self.y += self.vy * dt
-
-        # Collide with world geometry
-        for rx, ry, rw, rh in colliders:
-            cx, cy, r = self.x, self.y, self.r
-            closest_x = clamp(cx, rx, rx + rw)
-            closest_y = clamp(cy, ry, ry + rh)
-            dx = cx - closest_x; dy = cy - closest_y
-            d2 = dx*dx + dy*dy
-            if d2 < r*r:
-                d = d2 ** 0.5 if d2 > 0 else 0.0
-                if d == 0.0:
-                    left = abs(cx - rx); right = abs((rx + rw) - cx)
-                    bottom = abs(cy - ry); top = abs((ry + rh) - cy)
-                    m = min(left, right, bottom, top)
-                    px, py = (-(r),0) if m==left else ((r),0) if m==right else (0, -(r)) if m==bottom else (0, r)
-                else:
-                    nx, ny = dx/d, dy/d
-                    push = r - d
-                    px, py = nx*push, ny*push
-                self.x += px; self.y += py
-                if d2 > 0:
-                    nx, ny = normalize(px, py)
-                    vn = self.vx*nx + self.vy*ny
-                    if vn < 0:
-                        self.vx -= 1.8 * vn * nx
-                        self.vy -= 1.8 * vn * ny
+    def update(self, dt, bounds):
+        # A resting ball has nothing to integrate or collide
+        if not self.in_motion:
+            if self.smoke_timer > 0:
+                self.smoke_timer = max(0.0, self.smoke_timer - dt)
+            return
+        # Integrate, then collide with world geometry
+        self.x, self.y, self.vx, self.vy = _resolve_collisions(
+            self.x + self.vx * dt, self.y + self.vy * dt, self.vx, self.vy, self.r, bounds
+        )
 
         # Base friction
-        speed = length(self.vx, self.vy)
-        if speed < 5:
+        speed2 = self.vx * self.vx + self.vy * self.vy
+        if speed2 < 25.0:  # |v| < 5
             self.vx = self.vy = 0.0; self.in_motion = False
         else:
             # Base friction factor expressed per 60 FPS frame.  Raise to
@@ -229,7 +161,8 @@ class Ball:
             self.vx *= fric; self.vy *= fric
 
             # Extra *low-speed damping*: quickly but smoothly bleed velocity
-            if speed < LOW_SPEED_THRESHOLD:
+            if speed2 < LOW_SPEED_THRESHOLD * LOW_SPEED_THRESHOLD:
+                speed = speed2 ** 0.5
                 # Blend damping: strong when very slow, lighter near threshold
                 t = max(0.0, min(1.0, 1.0 - (speed / LOW_SPEED_THRESHOLD)))
                 # per-frame (assuming ~60FPS); raise to dt*60 for frame-rate independence
@@ -238,7 +171,7 @@ class Ball:
                 damp = per_frame ** max(1.0, (dt * 60.0))
                 self.vx *= damp; self.vy *= damp
                 # Snap stop when tiny
-                if length(self.vx, self.vy) < 30:
+                if self.vx*self.vx + self.vy*self.vy < 900.0:  # |v| < 30
                     self.vx = self.vy = 0.0; self.in_motion = False
 
         if self.smoke_timer > 0:
@@ -260,6 +193,7 @@ class _FlashlightGPU:
         self.fbo = None
         self.rect = None
         self.coll_tex = None
+        self.coll_src = None
         self.max_colliders = 0
         # textures holding per-agent parameters
         self.agent_tex0 = None
@@ -279,6 +213,11 @@ class _FlashlightGPU:
                 self.rect = self.Rectangle(pos=(0, 0), size=(width, 1))
 
     def _ensure_colliders(self, colliders):
+        # Callers pass the per-level collider grid's rect list, which is
+        # replaced whenever the colliders change; skip re-packing otherwise.
+        if colliders is self.coll_src and self.coll_tex is not None:
+            return
+        self.coll_src = colliders
         count = len(colliders)
         if self.coll_tex is None or count > self.max_colliders:
             # Create/resize collider texture. Each texel stores x,y,w,h.
@@ -317,8 +256,6 @@ class _FlashlightGPU:
             self.agent_tex1.blit_buffer(buf1.tobytes(), colorfmt="rgba", bufferfmt="float")
 
     def compute_all(self, agents, colliders):
-        from math import cos, sin
-
         if not agents:
             return []
         steps = agents[0].ray_steps
@@ -347,16 +284,11 @@ class _FlashlightGPU:
         results = []
         width = steps + 1
         for ai, a in enumerate(agents):
-            base_ang = a._angle_dir()
-            start_ang = base_ang + a.fov_half
-            end_ang = base_ang - a.fov_half
             pts = []
             offset = ai * width
-            for i in range(steps + 1):
+            for i, (dx, dy) in enumerate(zip(*a._ray_dirs())):
                 tnorm = data[(offset + i) * 4]
                 dist = tnorm * a.cone_len
-                ang = start_ang + (end_ang - start_ang) * (i / float(steps))
-                dx, dy = cos(ang), sin(ang)
                 pts.append((a.x + dx * dist, a.y + dy * dist))
             results.append(pts)
         return results
@@ -375,6 +307,13 @@ def _get_gpu_flashlight():
     return _gpu_flashlight_ctx if _gpu_flashlight_ctx else None
 
 class Agent:
+    __slots__ = (
+        'ax', 'ay', 'bx', 'by', 'x', 'y', 'dir', 'patrol_speed', 'chase_speed',
+        'fov_half', '_cos_view', 'cone_len', 'look_dirx', 'look_diry', 'chasing',
+        'ray_steps', 'turn_timer', 'turn_duration', '_cos_rel', '_sin_rel',
+        '_dir_ab', '_dir_ba',
+    )
+
     def __init__(self, ax, ay, bx, by, speed=70, fov_deg=55, cone_len=220):
         self.ax, self.ay = ax, ay
         self.bx, self.by = bx, by
@@ -383,31 +322,57 @@ class Agent:
         self.patrol_speed = speed
         self.chase_speed = speed * 1.35
         self.fov_half = radians(fov_deg/2.0)
+        self._cos_view = cos(self.fov_half + 1e-6)
         self.cone_len = cone_len
-        self.look_dirx, self.look_diry = normalize(bx-ax, by-ay)
+        # Patrol directions are fixed for the agent's lifetime
+        self._dir_ab = normalize(bx-ax, by-ay)
+        self._dir_ba = (-self._dir_ab[0], -self._dir_ab[1])
+        self.look_dirx, self.look_diry = self._dir_ab
         self.chasing = False
         self.ray_steps = 56
         self.turn_timer = 0.0
         self.turn_duration = 0.4
+        # Ray directions relative to the look direction, swept from +fov_half
+        # to -fov_half.  They never change, so the per-frame cone only needs a
+        # rotation instead of 2 trig calls per ray.  Plain lists: cast_rays
+        # takes them on every backend, NumPy included.
+        rel = [self.fov_half - 2.0 * self.fov_half * i / self.ray_steps for i in range(self.ray_steps + 1)]
+        self._cos_rel = [cos(a) for a in rel]
+        self._sin_rel = [sin(a) for a in rel]
     def _angle_dir(self):
-        from math import atan2
         return atan2(self.look_diry, self.look_dirx)
-    def update(self, dt, ball, colliders):
-        from math import cos, sin
+    def _ray_dirs(self):
+        # World-space unit directions of the flashlight rays
+        lx, ly = self.look_dirx, self.look_diry
+        l = (lx * lx + ly * ly) ** 0.5
+        if l == 0:
+            lx, ly = 1.0, 0.0
+        else:
+            lx /= l; ly /= l
+        cr, sr = self._cos_rel, self._sin_rel
+        return (
+            [c * lx - s * ly for c, s in zip(cr, sr)],
+            [c * ly + s * lx for c, s in zip(cr, sr)],
+        )
+    def update(self, dt, ball, colliders, grid=None):
         hidden = ball.smoke_timer > 0.0
         ball_visible = False
         if not hidden:
+            # Range and cone-angle mask first, in squared / unnormalized form
+            # (dot >= cos * dist), so the LOS raycast only runs for agents
+            # that could actually see the ball.
             dx, dy = (ball.x - self.x, ball.y - self.y)
-            dist = length(dx, dy)
-            if dist <= self.cone_len:
-                vxn, vyn = normalize(dx, dy)
-                ang_ok = (vxn*self.look_dirx + vyn*self.look_diry) >= cos(self.fov_half + 1e-6)
-                if ang_ok and not los_blocked(self.x, self.y, ball.x, ball.y, colliders):
-                    ball_visible = True
+            dist2 = dx*dx + dy*dy
+            if 0 < dist2 <= self.cone_len * self.cone_len:
+                if dx*self.look_dirx + dy*self.look_diry >= self._cos_view * dist2 ** 0.5:
+                    if grid is not None:
+                        colliders = grid.query_segment(self.x, self.y, ball.x, ball.y)
+                    if not los_blocked(self.x, self.y, ball.x, ball.y, colliders):
+                        ball_visible = True
         self.chasing = ball_visible
         if self.chasing:
             vx, vy = ball.x - self.x, ball.y - self.y
-            dist = length(vx, vy)
+            dist = (vx * vx + vy * vy) ** 0.5
             if dist > 1e-3:
                 vxn, vyn = vx/dist, vy/dist
                 self.x += vxn * self.chase_speed * dt
@@ -422,15 +387,12 @@ class Agent:
                 self.look_diry = lx * s + ly * c
                 self.turn_timer = max(0.0, self.turn_timer - dt)
                 if self.turn_timer <= 0.0:
-                    if self.dir > 0:
-                        self.look_dirx, self.look_diry = normalize(self.bx-self.ax, self.by-self.ay)
-                    else:
-                        self.look_dirx, self.look_diry = normalize(self.ax-self.bx, self.ay-self.by)
+                    self.look_dirx, self.look_diry = self._dir_ab if self.dir > 0 else self._dir_ba
             else:
                 tx = self.bx if self.dir > 0 else self.ax
                 ty = self.by if self.dir > 0 else self.ay
                 vx, vy = tx - self.x, ty - self.y
-                dist = length(vx, vy)
+                dist = (vx * vx + vy * vy) ** 0.5
                 step = self.patrol_speed * dt
                 if dist <= step:
                     self.x, self.y = tx, ty
@@ -440,7 +402,8 @@ class Agent:
                     vxn, vyn = (vx/dist, vy/dist) if dist else (0, 0)
                     self.x += vxn * step; self.y += vyn * step
                     self.look_dirx, self.look_diry = vxn, vyn
-        return length(ball.x - self.x, ball.y - self.y) <= (ball.r + 10)
+        dx = ball.x - self.x; dy = ball.y - self.y
+        return dx * dx + dy * dy <= (ball.r + 10) * (ball.r + 10)
     def compute_flashlight_polygon(self, colliders, precomputed=None):
         if precomputed is not None:
             return precomputed
@@ -452,35 +415,61 @@ class Agent:
                 pass
         return self._compute_flashlight_polygon_cpu(colliders)
 
-    def _compute_flashlight_polygon_cpu(self, colliders):
-        from math import cos, sin
-        base_ang = self._angle_dir()
-        start_ang = base_ang + self.fov_half
-        end_ang = base_ang - self.fov_half
-        pts = []
-        for i in range(self.ray_steps + 1):
-            t = i / float(self.ray_steps)
-            ang = start_ang + (end_ang - start_ang) * t
-            dx, dy = cos(ang), sin(ang)
-            hit_pt = None
-            nearest_d2 = None
-            tx = self.x + dx * self.cone_len
-            ty = self.y + dy * self.cone_len
-            for rect in colliders:
-                pt = ray_rect_nearest_hit(self.x, self.y, dx, dy, rect)
-                if pt is not None:
-                    d2 = (pt[0] - self.x) ** 2 + (pt[1] - self.y) ** 2
-                    if nearest_d2 is None or d2 < nearest_d2:
-                        nearest_d2 = d2
-                        hit_pt = pt
-            if hit_pt is None:
-                pts.append((tx, ty))
-            else:
-                if nearest_d2 is not None and nearest_d2 > (self.cone_len * self.cone_len):
-                    pts.append((tx, ty))
-                else:
-                    pts.append(hit_pt)
-        return pts
+    def _compute_flashlight_polygon_cpu(self, colliders, boxes=None):
+        dirs_x, dirs_y = self._ray_dirs()
+        colliders, boxes = self._cull_to_cone(colliders, boxes, dirs_x, dirs_y)
+        return cast_rays(self.x, self.y, dirs_x, dirs_y, self.cone_len, colliders, boxes)
+
+    def _cull_to_cone(self, colliders, boxes, dirs_x, dirs_y):
+        # Drop colliders that cannot meet the cone: farther than cone_len, or
+        # entirely outside the angular interval between its two edge rays.
+        # The edge test is a separating-axis check, valid while the cone is
+        # convex (fov < 180 degrees).
+        ox, oy = self.x, self.y
+        lx, ly = dirs_x[0], dirs_y[0]      # +fov_half edge
+        rx_, ry_ = dirs_x[-1], dirs_y[-1]  # -fov_half edge
+        convex = self.fov_half < pi / 2
+        reach2 = self.cone_len * self.cone_len
+        keep = []
+        for i, (x, y, w, h) in enumerate(colliders):
+            x0 = x - ox; y0 = y - oy; x1 = x0 + w; y1 = y0 + h
+            cx = x0 if x0 > 0 else x1 if x1 < 0 else 0.0
+            cy = y0 if y0 > 0 else y1 if y1 < 0 else 0.0
+            if cx*cx + cy*cy > reach2:
+                continue
+            if convex:
+                # Smallest cross(left, corner) > 0: box is wholly counter-clockwise
+                # of the left edge.  Largest cross(right, corner) < 0: wholly
+                # clockwise of the right edge.
+                if lx * (y0 if lx >= 0 else y1) - ly * (x1 if ly >= 0 else x0) > 0:
+                    continue
+                if rx_ * (y1 if rx_ >= 0 else y0) - ry_ * (x0 if ry_ >= 0 else x1) < 0:
+                    continue
+            keep.append(i)
+        if len(keep) == len(colliders):
+            return colliders, boxes
+        return [colliders[i] for i in keep], (None if boxes is None else boxes[keep])
+
+def _rects_geometry(rects):
+    # Vertices and triangle indices for rects: 4 verts and 2 triangles each
+    verts = []; idx = []
+    for i, (rx, ry, rw, rh) in enumerate(rects):
+        verts.extend((rx, ry, 0, 0, rx + rw, ry, 0, 0, rx + rw, ry + rh, 0, 0, rx, ry + rh, 0, 0))
+        v = 4 * i
+        idx.extend((v, v + 1, v + 2, v, v + 2, v + 3))
+    return verts, idx
+
+def _rects_mesh(rects):
+    # All rects as a single triangle mesh
+    verts, idx = _rects_geometry(rects)
+    return Mesh(vertices=verts, indices=idx, mode='triangles')
+
+def _fan_indices(n_points):
+    # Triangle fan around vertex 0 over n_points rim vertices
+    idx = []
+    for i in range(1, n_points):
+        idx.extend((0, i, i + 1))
+    return idx
 
 # ------------------------------- Game Widget ---------------------------------
 class StealthGolf(Widget):
@@ -520,6 +509,7 @@ class StealthGolf(Widget):
         self.transition_dir = 0  # +1 up, -1 down
         self.transition_cooldown = 0.0
 
+        self._init_canvas()
         Clock.schedule_interval(self.update, 1.0/60.0)
 
     # --------- Level I/O ----------
@@ -661,6 +651,13 @@ class StealthGolf(Widget):
         # Reset hacking state when switching floors
         self.hacking_door = None
         self.hack_timer = 0.0
+        self._rebuild_collider_grid()
+        self._world_dirty = True
+
+    def _rebuild_collider_grid(self):
+        # Broadphase over the current colliders; rebuilt whenever a door
+        # opens or closes so queries never return stale rects.
+        self._collider_grid = UniformGrid(self.colliders)
 
     def _fallback_level(self):
         return {
@@ -784,7 +781,15 @@ class StealthGolf(Widget):
             else:
                 if self.transition_cooldown > 0:
                     self.transition_cooldown = max(0.0, self.transition_cooldown - dt)
-                self.ball.update(dt, self.colliders)
+                b = self.ball
+                candidates = ()
+                if b.in_motion:
+                    # Cover the integration step plus a push-out from a first contact
+                    reach = 2 * b.r + (abs(b.vx) + abs(b.vy)) * dt
+                    grid = self._collider_grid
+                    bounds = grid.bounds
+                    candidates = [bounds[i] for i in grid.query_rect_ids(b.x - reach, b.y - reach, 2 * reach, 2 * reach)]
+                b.update(dt, candidates)
                 if not self.hacking_door:
                     for d in self.doors:
                         if d.get("open"):
@@ -804,14 +809,16 @@ class StealthGolf(Widget):
                         self.hack_timer = max(0.0, self.hack_timer - dt)
                         if self.hack_timer <= 0.0:
                             self.hacking_door["open"] = True
+                            self._world_dirty = True
                             if "_src" in self.hacking_door:
                                 self.hacking_door["_src"]["open"] = True
                             rect = self.hacking_door["rect"]
                             if rect in self.colliders:
                                 self.colliders.remove(rect)
+                                self._rebuild_collider_grid()
                             self.hacking_door = None
                 for a in self.agents:
-                    caught = a.update(dt, self.ball, self.colliders)
+                    caught = a.update(dt, self.ball, self.colliders, self._collider_grid)
                     if caught and not self.win:
                         self.caught = True; self.message_timer = 2.0
                 # hole
@@ -819,7 +826,7 @@ class StealthGolf(Widget):
                 if (
                     self.current_floor == self.hole_floor
                     and not self.win
-                    and length(self.ball.x - cx, self.ball.y - cy) <= (hr - 2)
+                    and (self.ball.x - cx) ** 2 + (self.ball.y - cy) ** 2 <= (hr - 2) ** 2
                 ):
                     self.win = True; self.drop_timer = 0.9; self.message_timer = 1.6
                     self.ball.vx = self.ball.vy = 0.0; self.ball.in_motion = False
@@ -860,6 +867,7 @@ class StealthGolf(Widget):
                 self.prev_walls = []
                 self.prev_decor = []
                 self.prev_agents = []
+                self._world_dirty = True
         self._update_camera(); self.draw()
 
     # ------------- Camera -------------
@@ -936,60 +944,97 @@ class StealthGolf(Widget):
                 else:
                     Rectangle(pos=(rx, ry), size=(rw, rh))
 
-    def _draw_agent_lights(self, agents, alpha):
-        if not agents:
-            return
-        gpu = _get_gpu_flashlight()
-        polys = None
-        if gpu is not None:
-            try:
-                polys = gpu.compute_all(agents, self.colliders)
-            except Exception:
-                polys = None
-        if polys is None:
-            polys = [a._compute_flashlight_polygon_cpu(self.colliders) for a in agents]
-        for a, pts in zip(agents, polys):
-            pts = a.compute_flashlight_polygon(self.colliders, precomputed=pts)
-            verts = [(a.x, a.y, 0, 0)] + [(x, y, 0, 0) for (x, y) in pts]
-            idx = []
-            for i in range(1, len(verts) - 1):
-                idx.extend([0, i, i + 1])
-            base = 0.18 if not a.chasing else 0.35
-            Color(1, 1, 0.65, base * alpha)
-            Mesh(vertices=sum(([vx, vy, 0, 0] for vx, vy, _, _ in verts), []), indices=idx, mode='triangles')
-
-    def _draw_agent_bodies(self, agents, alpha):
-        for a in agents:
-            base = 1.0 if not a.chasing else 0.9
-            Color(0.9, 0.2, 0.2, base * alpha)
-            Rectangle(pos=(a.x - 8, a.y - 8), size=(16, 16))
+    def _flashlight_polys(self, agents):
+        if not agents:
+            return []
+        gpu = _get_gpu_flashlight()
+        polys = None
+        if gpu is not None:
+            try:
+                polys = gpu.compute_all(agents, self._collider_grid.rects)
+            except Exception:
+                polys = None
+        if polys is None:
+            polys = [a._compute_flashlight_polygon_cpu(*self._cone_candidates(a)) for a in agents]
+        return [a.compute_flashlight_polygon(self.colliders, precomputed=pts) for a, pts in zip(agents, polys)]
+
+    def _cone_candidates(self, agent):
+        # Colliders that may intersect the agent's cone, plus their cached
+        # bounds array (None without NumPy)
+        grid = self._collider_grid
+        reach = agent.cone_len
+        ids = grid.query_rect_ids(agent.x - reach, agent.y - reach, 2 * reach, 2 * reach)
+        rects = grid.rects
+        boxes = grid.boxes
+        return [rects[i] for i in ids], (None if boxes is None else boxes[ids])
 
     # ------------- Draw -------------
-    def draw(self):
-        self.canvas.clear()
+    def _init_canvas(self):
+        # Persistent instruction tree.  Static layers live in sub-canvases that
+        # are only rebuilt when the floor changes; per-frame state (camera,
+        # lights, agents, ball, aim, fade) is updated in place by draw().
         with self.canvas:
-            PushMatrix(); Translate(-self.cam_x, -self.cam_y, 0)
-            # BG
-            Color(0.08,0.09,0.11,1); Rectangle(pos=(0,0), size=(self.world_w, self.world_h))
-            # Grid
-            Color(0.12,0.13,0.16,1); grid=60
-            for x in range(0, self.world_w, grid): Rectangle(pos=(x,0), size=(2, self.world_h))
-            for y in range(0, self.world_h, grid): Rectangle(pos=(0,y), size=(self.world_w,2))
-            # Walls
+            PushMatrix()
+            self._cam_translate = Translate(0, 0, 0)
+            self._world_canvas = Canvas()
+            self._hack_canvas = Canvas()
+            self._stairs_canvas = Canvas()
+            self._lights_canvas = Canvas()
+            self._bodies_canvas = Canvas()
+            self._hole_canvas = Canvas()
+            self._ball_color = Color(1, 1, 1, 1)
+            self._ball_ellipse = Ellipse(size=(28, 28))
+            # Hidden via alpha rather than emptied points: an empty Line still draws
+            self._aim_color = Color(0.9, 0.9, 1.0, 0)
+            self._aim_line = Line(points=[0, 0, 0, 0], width=2)
+            PopMatrix()
+            self._fade_color = Color(0, 0, 0, 0)
+            self._fade_rect = Rectangle(pos=(0, 0), size=self.size)
+        self._grid_tex = grid_texture(GRID_CELL, 2, (20, 23, 28, 255), (31, 33, 41, 255))
+        self._world_dirty = True
+        self._world_cells = None
+        self._hack_drawn = False
+        self._agent_views = []
+        self._agent_views_for = None
+
+    def _view_cells(self):
+        # Camera rect snapped to CULL_CELL cells; the culled static layers
+        # only need rebuilding when this changes
+        c = CULL_CELL
+        return (
+            int(self.cam_x // c), int(self.cam_y // c),
+            int((self.cam_x + self.width) // c), int((self.cam_y + self.height) // c),
+        )
+
+    def _rebuild_world(self, view_cells=None):
+        if view_cells is None:
+            view_cells = self._view_cells()
+        self._world_dirty = False
+        self._world_cells = view_cells
+        # Only emit geometry overlapping the snapped view (padded for outlines)
+        c = CULL_CELL
+        cx0, cy0, cx1, cy1 = view_cells
+        view = (cx0 * c - 4, cy0 * c - 4, (cx1 + 1) * c + 4, (cy1 + 1) * c + 4)
+        visible = lambda rect: rect_in_view(rect, view)
+        self._world_canvas.clear()
+        with self._world_canvas:
+            # BG + grid: one quad tiling the baked grid cell
+            tex = self._grid_tex
+            tex.uvsize = (self.world_w / GRID_CELL, self.world_h / GRID_CELL)
+            Color(1,1,1,1); Rectangle(pos=(0,0), size=(self.world_w, self.world_h), texture=tex)
+            # Walls (one mesh per floor)
             if self.prev_walls:
                 Color(0.25,0.28,0.33,1.0 - self.floor_fade_t)
-                for rx,ry,rw,rh in self.prev_walls:
-                    Rectangle(pos=(rx,ry), size=(rw,rh))
+                _rects_mesh([r for r in self.prev_walls if visible(r)])
             Color(0.25,0.28,0.33,self.floor_fade_t)
-            for rx,ry,rw,rh in self.walls_drawn:
-                Rectangle(pos=(rx,ry), size=(rw,rh))
+            _rects_mesh([r for r in self.walls_drawn if visible(r)])
             # Decor
             if self.prev_decor:
-                self._draw_decor(self.prev_decor, 1.0 - self.floor_fade_t)
-            self._draw_decor(self.decor, self.floor_fade_t)
+                self._draw_decor([d for d in self.prev_decor if visible(d.get("rect", [0, 0, 0, 0]))], 1.0 - self.floor_fade_t)
+            self._draw_decor([d for d in self.decor if visible(d.get("rect", [0, 0, 0, 0]))], self.floor_fade_t)
             # Doors
             for d in self.doors:
-                if d.get("open"):
+                if d.get("open") or not (visible(d["rect"]) or visible(d["screen"])):
                     continue
                 rx, ry, rw, rh = d["rect"]
                 sx, sy, sw, sh = d["screen"]
@@ -998,15 +1043,11 @@ class StealthGolf(Widget):
                 Rectangle(pos=(rx, ry), size=(rw, rh))
                 Color(col[0], col[1], col[2], self.floor_fade_t)
                 Rectangle(pos=(sx, sy), size=(sw, sh))
-            if self.hacking_door and self.hack_timer > 0:
-                sx, sy, sw, sh = self.hacking_door["screen"]
-                pct = 1.0 - (self.hack_timer / HACK_DURATION)
-                Color(0.2, 0.8, 0.2, 1)
-                Rectangle(pos=(sx, sy + sh + 4), size=(sw * pct, 12))
-                Color(1, 1, 1, 1)
-                Line(rectangle=(sx, sy + sh + 4, sw, 12), width=1)
-            # Stairs
+        self._stairs_canvas.clear()
+        with self._stairs_canvas:
             for s in self.stairs:
+                if not visible(s["rect"]):
+                    continue
                 rx, ry, rw, rh = s["rect"]
                 steps = 6
                 if s["dir"] == "up":
@@ -1018,55 +1059,131 @@ class StealthGolf(Widget):
                 for i in range(steps):
                     y = ry + (i/steps)*rh
                     Line(points=[rx, y, rx+rw, y], width=1)
-            # Lights (occluded)
-            self._draw_agent_lights(self.prev_agents, 1.0 - self.floor_fade_t)
-            self._draw_agent_lights(self.agents, self.floor_fade_t)
-            # Agents
-            self._draw_agent_bodies(self.prev_agents, 1.0 - self.floor_fade_t)
-            self._draw_agent_bodies(self.agents, self.floor_fade_t)
-            # Hole
-            if self.current_floor == self.hole_floor:
+        self._hole_canvas.clear()
+        if self.current_floor == self.hole_floor:
+            with self._hole_canvas:
                 cx,cy,hr=self.hole
                 Color(0.1,0.5,0.15,1); Ellipse(pos=(cx-(hr+6), cy-(hr+6)), size=((hr+6)*2,(hr+6)*2))
                 Color(0.02,0.02,0.02,1); Ellipse(pos=(cx-hr, cy-hr), size=(hr*2,hr*2))
-            # Ball
-            if self.ball.smoke_timer > 0:
-                Color(0.35,0.35,0.38,1)
-            else:
-                # Dim the ball slightly while it's rolling to give subtle motion feedback.
-                shade = 0.8 if self.ball.in_motion else 1.0
-                r, g, b, a = self.ball.color
-                Color(r * shade, g * shade, b * shade, a)
-            Ellipse(pos=(self.ball.x-14, self.ball.y-14), size=(28,28))
-            # Aim line
-            if self.aiming:
-                sx, sy = self.aim_start; cx2, cy2 = self.aim_current
-                Color(0.9,0.9,1.0,0.7); Line(points=[self.ball.x,self.ball.y,cx2,cy2], width=2)
-            PopMatrix()
-            # Fade overlay
-            if self.fade_alpha > 0:
-                Color(0,0,0,self.fade_alpha); Rectangle(pos=(0,0), size=(self.width, self.height))
-        self._labels()
-
+
+    def _rebuild_agent_views(self):
+        # One light (Color + Mesh) per agent, for the floor fading out followed
+        # by the current one.  Bodies share one alpha per (fading out, chasing)
+        # group, so each group is batched into a single Mesh of quads.
+        self._lights_canvas.clear()
+        self._bodies_canvas.clear()
+        views = []
+        for agents, fading_out in ((self.prev_agents, True), (self.agents, False)):
+            for a in agents:
+                # Fan vertex buffer: apex then one (x, y, 0, 0) per ray
+                verts = [0.0] * ((a.ray_steps + 2) * 4)
+                with self._lights_canvas:
+                    light_color = Color(1, 1, 0.65, 0)
+                    mesh = Mesh(vertices=verts, indices=_fan_indices(a.ray_steps + 1), mode='triangles')
+                views.append((a, fading_out, light_color, mesh, verts))
+        self._body_groups = {}
+        with self._bodies_canvas:
+            for fading_out in (True, False):
+                for chasing in (False, True):
+                    self._body_groups[(fading_out, chasing)] = (
+                        Color(0.9, 0.2, 0.2, 0),
+                        Mesh(vertices=[], indices=[], mode='triangles'),
+                    )
+        self._agent_views = views
+        self._agent_views_for = (self.prev_agents, self.agents)
+
+    def _update_agent_views(self):
+        views_for = self._agent_views_for
+        if views_for is None or views_for[0] is not self.prev_agents or views_for[1] is not self.agents:
+            self._rebuild_agent_views()
+        polys = self._flashlight_polys(self.prev_agents) + self._flashlight_polys(self.agents)
+        body_rects = {key: [] for key in self._body_groups}
+        for (a, fading_out, light_color, mesh, verts), pts in zip(self._agent_views, polys):
+            alpha = 1.0 - self.floor_fade_t if fading_out else self.floor_fade_t
+            light_color.a = (0.18 if not a.chasing else 0.35) * alpha
+            if len(verts) != (len(pts) + 1) * 4:
+                verts[:] = [0.0] * ((len(pts) + 1) * 4)
+                mesh.indices = _fan_indices(len(pts))
+            # Fill x/y slots in place; the zero uv slots never change
+            verts[0] = a.x; verts[1] = a.y
+            verts[4::4] = [p[0] for p in pts]
+            verts[5::4] = [p[1] for p in pts]
+            mesh.vertices = verts
+            body_rects[(fading_out, a.chasing)].append((a.x - 8, a.y - 8, 16, 16))
+        for (fading_out, chasing), (body_color, body_mesh) in self._body_groups.items():
+            alpha = 1.0 - self.floor_fade_t if fading_out else self.floor_fade_t
+            body_color.a = (1.0 if not chasing else 0.9) * alpha
+            verts, idx = _rects_geometry(body_rects[(fading_out, chasing)])
+            if len(body_mesh.indices) != len(idx):
+                body_mesh.indices = idx
+            body_mesh.vertices = verts
+
+    def draw(self):
+        self._cam_translate.xy = (-self.cam_x, -self.cam_y)
+        # Static layers: rebuilt on floor/door changes, during the cross-fade
+        # and when the camera moves into a new cull cell
+        view_cells = self._view_cells()
+        if self._world_dirty or self.floor_fade_t < 1.0 or view_cells != self._world_cells:
+            self._rebuild_world(view_cells)
+        # Hack progress bar
+        if self.hacking_door and self.hack_timer > 0:
+            self._hack_canvas.clear()
+            with self._hack_canvas:
+                sx, sy, sw, sh = self.hacking_door["screen"]
+                pct = 1.0 - (self.hack_timer / HACK_DURATION)
+                Color(0.2, 0.8, 0.2, 1)
+                Rectangle(pos=(sx, sy + sh + 4), size=(sw * pct, 12))
+                Color(1, 1, 1, 1)
+                Line(rectangle=(sx, sy + sh + 4, sw, 12), width=1)
+            self._hack_drawn = True
+        elif self._hack_drawn:
+            self._hack_canvas.clear()
+            self._hack_drawn = False
+        # Lights (occluded) and agents
+        self._update_agent_views()
+        # Ball
+        if self.ball.smoke_timer > 0:
+            self._ball_color.rgba = (0.35,0.35,0.38,1)
+        else:
+            # Dim the ball slightly while it's rolling to give subtle motion feedback.
+            shade = 0.8 if self.ball.in_motion else 1.0
+            r, g, b, a = self.ball.color
+            self._ball_color.rgba = (r * shade, g * shade, b * shade, a)
+        self._ball_ellipse.pos = (self.ball.x-14, self.ball.y-14)
+        # Aim line
+        if self.aiming:
+            cx2, cy2 = self.aim_current
+            self._aim_line.points = [self.ball.x,self.ball.y,cx2,cy2]
+            self._aim_color.a = 0.7
+        else:
+            self._aim_color.a = 0
+        # Fade overlay
+        self._fade_color.a = self.fade_alpha
+        self._fade_rect.size = (self.width, self.height)
+        self._labels()
+
     def _labels(self):
         if not hasattr(self, "banner"):
-            self.banner = Label(text="", font_size=20, color=(1,1,1,1), size_hint=(None,None), size=(self.width,40), pos=(10, self.height - 90))
+            self.banner = Label(text="", markup=True, font_size=20, color=(1,1,1,1), size_hint=(None,None), size=(self.width,40), pos=(10, self.height - 90))
             self.add_widget(self.banner)
         if self.caught and self.message_timer > 0:
-            self.banner.text = "[b]Caught![/b] Tap to restart."; self.banner.markup=True
+            text = "[b]Caught![/b] Tap to restart."
             self.message_timer = max(0.0, self.message_timer - 1/60)
         elif self.win and self.drop_timer > 0:
-            self.banner.text = "Dropping to next level..."; self.banner.markup=True
+            text = "Dropping to next level..."
         elif self.win and self.drop_timer <= 0 and self.message_timer > 0:
-            self.banner.text = "[b]Level complete![/b] • Loading next (if present)…"; self.banner.markup=True
+            text = "[b]Level complete![/b] • Loading next (if present)…"
             self.message_timer = max(0.0, self.message_timer - 1/60)
         else:
-            self.banner.text = ""
+            text = ""
+        # Only touch the Label when the text changes; assignments re-render it
+        if self.banner.text != text:
+            self.banner.text = text
 
     def _next_level_banner(self):
         self.message_timer = 3.0
         if hasattr(self, "banner"):
-            self.banner.text = "[b]Level complete![/b] • No more levels found."; self.banner.markup=True
+            self.banner.text = "[b]Level complete![/b] • No more levels found."
 
     def _reset_to_start(self):
         self.ball.x, self.ball.y = self.start_pos
@@ -1087,8 +1204,10 @@ class StealthGolf(Widget):
             else:
                 if rect not in self.colliders:
                     self.colliders.append(rect)
+        self._rebuild_collider_grid()
+        self._world_dirty = True
         for a in self.agents:
-            a.x,a.y = a.ax,a.ay; a.dir=1; a.chasing=False; a.look_dirx, a.look_diry = normalize(a.bx-a.ax, a.by-a.ay)
+            a.x,a.y = a.ax,a.ay; a.dir=1; a.chasing=False; a.look_dirx, a.look_diry = a._dir_ab
 
 # ----------------------------- Screens & App ---------------------------------
 
@@ -7,19 +7,27 @@
 # - Same JSON schema as before (now extended with "doors"); compatible with
 #   the loader game.
 #
-from math import cos, sin, atan2, sqrt, radians
+from math import cos, sin, sqrt, radians
+from functools import lru_cache
 import json, os
 from kivy.app import App
 from kivy.core.window import Window
 from kivy.clock import Clock
-from kivy.graphics import Color, Rectangle, Ellipse, Line, PushMatrix, PopMatrix, Translate, Mesh
+from kivy.graphics import Canvas, Color, Rectangle, Ellipse, Line, PushMatrix, PopMatrix, Translate, Mesh
 from kivy.uix.widget import Widget
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.label import Label
 from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.spinner import Spinner
-from common.geometry import length, normalize, seg_intersect, ray_rect_nearest_hit
+from common.geometry import length, normalize, seg_intersect, cast_rays, rect_in_view
+from common.graphics import grid_texture
+from common.broadphase import UniformGrid
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; level files then go through json
+    orjson = None
 
 try:
     Window.size = (900, 1000)  # larger editor window
@@ -27,12 +35,52 @@ except Exception:
     pass
 
 GRID = 20
+# Canvas layers, in draw order; see LevelCanvas._init_canvas
+LAYERS = ("grid", "walls", "decor", "agents", "overlay")
+CULL_CELL = 256  # walls, decor and cones are culled to the camera snapped to this (px)
+
+# Round to the nearest grid line (halves round up); floor division keeps
+# it exact for negative coordinates too
+def snap(v): return int((v + GRID // 2) // GRID) * GRID
+
+def point_in_rect(rect, px, py):
+    x, y, w, h = rect
+    return x <= px <= x + w and y <= py <= y + h
+
+def seg_dist2(ax, ay, bx, by, px, py):
+    # Squared distance from (px, py) to the segment a-b
+    vx = bx - ax; vy = by - ay
+    wx = px - ax; wy = py - ay
+    d = vx*vx + vy*vy
+    t = 0 if d == 0 else max(0, min(1, (vx*wx + vy*wy) / d))
+    dx = wx - t*vx; dy = wy - t*vy
+    return dx*dx + dy*dy
 
-def snap(v): return int(round(v / GRID)) * GRID
+@lru_cache(maxsize=64)
+def cone_offsets(fov_deg, steps):
+    # cos/sin of each cone ray's angle relative to the facing direction,
+    # sweeping from +fov/2 to -fov/2
+    fov_half = radians(fov_deg/2.0)
+    angs = [fov_half - 2*fov_half*(i/steps) for i in range(steps+1)]
+    return tuple(cos(g) for g in angs), tuple(sin(g) for g in angs)
 
+@lru_cache(maxsize=8)
+def fan_indices(n_points):
+    # Indices for a triangle_fan mesh: apex then n_points rim vertices
+    # (shared, never mutated)
+    return list(range(n_points + 1))
+
+@lru_cache(maxsize=4)
+def _json_files(dirpath, mtime_ns):
+    # Keyed on the directory's mtime, which changes whenever a file is added
+    # or removed, so a repeat listing is just one stat()
+    return tuple(sorted(f for f in os.listdir(dirpath) if f.endswith('.json')))
+
+@lru_cache(maxsize=64)
 def floor_label(idx):
     return f"F{idx+1}" if idx >= 0 else f"B{-idx}"
 
+@lru_cache(maxsize=64)
 def label_to_floor_index(label):
     if label.startswith("F") and label[1:].isdigit():
         return int(label[1:]) - 1
@@ -68,10 +116,32 @@ SCENERY_KIND_MAP = {
     "GolfBall": "golf_ball",
 }
 SCENERY_TOOLS = tuple(SCENERY_KIND_MAP.keys())
+# Tools that drag out a rect; checked on every touch event
+RECT_TOOLS = frozenset(("Wall","StairUp","StairDown","Door") + SCENERY_TOOLS)
 
 class LevelCanvas(Widget):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
+        # Layers to rebuild; marking any schedules a single redraw for the
+        # next frame, so an idle editor does no work at all
+        self._dirty = set(LAYERS)
+        self._draw_trigger = Clock.create_trigger(self._tick)
+        # Bumped on every wall change; keys the per-agent cone cache
+        self.walls_version = 0
+        self._cone_cache = {}
+        # Broadphase grids for Erase hit tests; decor and agents are built on
+        # first use after a change
+        self._wall_grid = None
+        self._decor_grid = None
+        self._stairs_grid = None
+        self._doors_grid = None
+        self._agent_grid = None
+        # Wall bounds (xmin, ymin, xmax, ymax) as an (N, 4) array (None without NumPy)
+        self.walls_np = None
+        # Camera cells the walls, decor and agents layers were last culled to
+        self._cull_cells = None
+        self._cull_view = None
+        self._init_canvas()
         # World
         self.world_w, self.world_h = 1400, 2200
         # Camera
@@ -98,7 +168,8 @@ class LevelCanvas(Widget):
         self.door_color = "red"
         # Status label (bottom-left overlay inside canvas)
         self.status = None
-        Clock.schedule_interval(self._tick, 1/60)
+        self.bind(size=self._on_resize)
+        self._draw_trigger()
 
     def _new_floor(self):
         return {"walls": [], "decor": [], "agents": [], "stairs": [], "doors": []}
@@ -110,6 +181,7 @@ class LevelCanvas(Widget):
         self.agents = f["agents"]
         self.stairs = f["stairs"]
         self.doors = f.get("doors", [])
+        self._mark_dirty("walls", "decor", "agents", "overlay")
 
     # --- IO ---
     def save_json(self, path):
@@ -121,14 +193,23 @@ class LevelCanvas(Widget):
             "hole_floor": self.hole_floor,
             "floors": self.floors,
         }
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2)
+        if orjson is not None:
+            with open(path, "wb") as f:
+                f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        else:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2)
 
     def load_json(self, path):
         if not os.path.exists(path):
             return False
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        if orjson is not None:
+            with open(path, "rb") as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        world = (self.world_w, self.world_h)
         self.world_w = int(data.get("world", {}).get("w", self.world_w))
         self.world_h = int(data.get("world", {}).get("h", self.world_h))
         self.start = list(map(int, data.get("start", self.start)))
@@ -151,6 +232,9 @@ class LevelCanvas(Widget):
             ]
         self.current_floor = self.start_floor
         self._refresh_floor_refs()
+        # The background/grid quad only depends on the world size
+        if (self.world_w, self.world_h) != world:
+            self._mark_dirty("grid")
         return True
 
     # --- Transforms ---
@@ -167,9 +251,10 @@ class LevelCanvas(Widget):
             self.drag_start_world = (touch.x, touch.y, self.cam_x, self.cam_y)
             return True
 
-        if self.tool in ("Wall","StairUp","StairDown","Door") + SCENERY_TOOLS:
+        if self.tool in RECT_TOOLS:
             self.dragging = True
             self.temp_rect = (wx, wy, 1, 1)
+            self._mark_dirty("overlay")
             return True
 
         if self.tool == "Agent":
@@ -180,40 +265,51 @@ class LevelCanvas(Widget):
                 agent = {"a":[ax,ay], "b":[wx,wy], "speed":80, "fov_deg":60, "cone_len":260}
                 self.agents.append(agent)
                 self.temp_agent_a = None
+                self._mark_dirty("agents")
             return True
 
         if self.tool == "Start":
-            self.start = [wx, wy]; self.start_floor = self.current_floor; return True
+            self.start = [wx, wy]; self.start_floor = self.current_floor; self._mark_dirty("overlay"); return True
 
         if self.tool == "Hole":
-            self.hole = {"cx": wx, "cy": wy, "r": 22}; self.hole_floor = self.current_floor; return True
+            self.hole = {"cx": wx, "cy": wy, "r": 22}; self.hole_floor = self.current_floor; self._mark_dirty("overlay"); return True
 
         if self.tool == "Erase":
-            # Erase decor first, then walls, then agents
-            def inside_rect(r):
-                x,y,w,h = r
-                return (x <= wx <= x+w) and (y <= wy <= y+h)
-            for i in reversed(range(len(self.decor))):
-                if inside_rect(self.decor[i]["rect"]): self.decor.pop(i); return True
-            for i in reversed(range(len(self.walls))):
-                if inside_rect(self.walls[i]): self.walls.pop(i); return True
-            for i in reversed(range(len(self.stairs))):
-                if inside_rect(self.stairs[i]["rect"]): self.stairs.pop(i); return True
-            for i in reversed(range(len(self.doors))):
+            # Erase decor first, then walls, then agents
+            # Only test the items whose broadphase cells contain the click
+            if self._decor_grid is None:
+                self._decor_grid = UniformGrid([d["rect"] for d in self.decor], cell=64)
+            for i in reversed(self._decor_grid.query_rect_ids(wx, wy, 0, 0)):
+                if point_in_rect(self.decor[i]["rect"], wx, wy): self.decor.pop(i); self._mark_dirty("decor"); return True
+            for i in reversed(self._wall_grid.query_rect_ids(wx, wy, 0, 0)):
+                if point_in_rect(self.walls[i], wx, wy): self.walls.pop(i); self._mark_dirty("walls", "agents"); return True
+            if self._stairs_grid is None:
+                self._stairs_grid = UniformGrid([s["rect"] for s in self.stairs], cell=64)
+            for i in reversed(self._stairs_grid.query_rect_ids(wx, wy, 0, 0)):
+                if point_in_rect(self.stairs[i]["rect"], wx, wy): self.stairs.pop(i); self._mark_dirty("decor"); return True
+            if self._doors_grid is None:
+                # One box per door covering both the door and its touchscreen
+                boxes = []
+                for d in self.doors:
+                    (rx,ry,rw,rh), (sx,sy,sw,sh) = d["rect"], d["screen"]
+                    x0 = min(rx,sx); y0 = min(ry,sy)
+                    boxes.append((x0, y0, max(rx+rw,sx+sw)-x0, max(ry+rh,sy+sh)-y0))
+                self._doors_grid = UniformGrid(boxes, cell=64)
+            for i in reversed(self._doors_grid.query_rect_ids(wx, wy, 0, 0)):
                 d = self.doors[i]
-                if inside_rect(d["rect"]) or inside_rect(d["screen"]):
-                    self.doors.pop(i); return True
-            # agents: near segment
-            def segdist2(ax,ay,bx,by,px,py):
-                vx,vy = bx-ax, by-ay; wx2,wy2 = px-ax, py-ay
-                c = vx*wx2 + vy*wy2; d = vx*vx + vy*vy
-                t = 0 if d==0 else max(0,min(1,c/d))
-                cx,cy = ax + t*vx, ay + t*vy
-                dx,dy = px-cx, py-cy
-                return dx*dx+dy*dy
-            for i in reversed(range(len(self.agents))):
+                if point_in_rect(d["rect"], wx, wy) or point_in_rect(d["screen"], wx, wy):
+                    self.doors.pop(i); self._mark_dirty("decor"); return True
+            # agents: near segment
+            if self._agent_grid is None:
+                # Path bounding boxes grown by the 20px pick radius
+                boxes = []
+                for a in self.agents:
+                    (ax,ay), (bx,by) = a["a"], a["b"]
+                    boxes.append((min(ax,bx)-20, min(ay,by)-20, abs(bx-ax)+40, abs(by-ay)+40))
+                self._agent_grid = UniformGrid(boxes, cell=64)
+            for i in reversed(self._agent_grid.query_rect_ids(wx, wy, 0, 0)):
                 A = self.agents[i]["a"]; B = self.agents[i]["b"]
-                if segdist2(A[0],A[1],B[0],B[1], wx,wy) <= (20*20): self.agents.pop(i); return True
+                if seg_dist2(A[0],A[1],B[0],B[1], wx,wy) <= (20*20): self.agents.pop(i); self._mark_dirty("agents"); return True
             return True
 
         return False
@@ -228,34 +324,41 @@ class LevelCanvas(Widget):
             self.cam_x = int(camx0 + dx); self.cam_y = int(camy0 + dy)
             self.cam_x = max(0, min(self.cam_x, self.world_w - self.width))
             self.cam_y = max(0, min(self.cam_y, self.world_h - self.height))
+            # Panning only moves the camera; the culled layers are rebuilt
+            # once it crosses into another CULL_CELL
+            self._translate.x = -self.cam_x; self._translate.y = -self.cam_y
+            self._check_cull()
             return True
 
-        if self.tool in ("Wall", "StairUp", "StairDown", "Door") + SCENERY_TOOLS and self.dragging and self.temp_rect:
+        if self.tool in RECT_TOOLS and self.dragging and self.temp_rect:
             x0,y0,_,_ = self.temp_rect
             x1,y1 = wx, wy
             x = min(x0,x1); y = min(y0,y1)
             w = max(1, abs(x1-x0)); h = max(1, abs(y1-y0))
-            self.temp_rect = (x,y,w,h); return True
+            self.temp_rect = (x,y,w,h); self._mark_dirty("overlay"); return True
 
         return False
 
     def on_touch_up(self, touch):
-        if self.tool in ("Wall","StairUp","StairDown","Door") + SCENERY_TOOLS and self.dragging and self.temp_rect:
+        if self.tool in RECT_TOOLS and self.dragging and self.temp_rect:
             x,y,w,h = self.temp_rect
             if w >= GRID and h >= GRID:
                 if self.tool == "Wall":
                     self.walls.append((x,y,w,h))
+                    self._mark_dirty("walls", "agents")
                 elif self.tool in SCENERY_TOOLS:
                     kind = SCENERY_KIND_MAP.get(self.tool, self.tool.lower())
                     self.decor.append({"kind":kind, "rect":[x,y,w,h]})
+                    self._mark_dirty("decor")
                 elif self.tool == "Door":
                     if self.pending_door_rect is None:
                         self.pending_door_rect = [x,y,w,h]
-                        self.temp_rect = None; self.dragging = False; return True
+                        self.temp_rect = None; self.dragging = False; self._mark_dirty("overlay"); return True
                     else:
                         door = {"rect": self.pending_door_rect, "screen": [x,y,w,h], "color": self.door_color}
                         self.doors.append(door)
                         self.pending_door_rect = None
+                        self._mark_dirty("decor")
                 else:
                     direction = "up" if self.tool=="StairUp" else "down"
                     self.stairs.append({"dir":direction, "rect":[x,y,w,h], "target": self.current_floor + (1 if direction=="up" else -1)})
@@ -265,9 +368,10 @@ class LevelCanvas(Widget):
                     dest = self.floors[target]
                     opp = "down" if direction=="up" else "up"
                     dest["stairs"].append({"dir":opp, "rect":[x,y,w,h], "target": self.current_floor})
+                    self._mark_dirty("decor")
             if hasattr(self.parent, '_update_floor_spinner'):
                 self.parent._update_floor_spinner()
-            self.temp_rect = None; self.dragging = False; return True
+            self.temp_rect = None; self.dragging = False; self._mark_dirty("overlay"); return True
 
         if self.tool == "Pan":
             self.dragging = False; self.drag_start_world = None; return True
@@ -275,34 +379,116 @@ class LevelCanvas(Widget):
         return False
 
     # --- Draw ---
-    def _tick(self, dt):
-        self.draw()
-
-    def draw(self):
-        self.canvas.clear()
+    def _init_canvas(self):
+        # Persistent instruction tree: the camera Translate followed by one
+        # sub-canvas per layer, each cleared and rebuilt only when its data
+        # changes
         with self.canvas:
             PushMatrix()
-            Translate(-self.cam_x, -self.cam_y, 0)
-
-            # Background
-            Color(0.08, 0.09, 0.11, 1.0)
-            Rectangle(pos=(0,0), size=(self.world_w, self.world_h))
+            self._translate = Translate(0, 0, 0)
+            self._grid_canvas = Canvas()
+            self._walls_canvas = Canvas()
+            self._decor_canvas = Canvas()
+            self._agents_canvas = Canvas()
+            self._overlay_canvas = Canvas()
+            PopMatrix()
+        self._grid_tex = grid_texture(GRID, 1, (20, 23, 28, 255), (31, 33, 41, 255))
+
+    def _mark_dirty(self, *layers):
+        if "walls" in layers:
+            self._sync_walls()
+        if "decor" in layers:
+            self._decor_grid = self._stairs_grid = self._doors_grid = None
+        if "agents" in layers:
+            self._agent_grid = None
+        self._dirty.update(layers)
+        self._draw_trigger()
+
+    def _sync_walls(self):
+        self.walls_version += 1
+        self._wall_grid = UniformGrid(self.walls, cell=64)
+        self.walls_np = self._wall_grid.boxes
+
+    def _on_resize(self, *_):
+        self._check_cull()
+
+    def _view_cells(self):
+        c = CULL_CELL
+        return (
+            int(self.cam_x // c), int(self.cam_y // c),
+            int((self.cam_x + self.width) // c), int((self.cam_y + self.height) // c),
+        )
+
+    def _check_cull(self):
+        # Re-cull without touching the wall data (and so the cone cache)
+        if self._view_cells() != self._cull_cells:
+            self._dirty.update(("walls", "decor", "agents"))
+            self._draw_trigger()
 
-            # Grid
-            Color(0.12, 0.13, 0.16, 1.0)
-            for x in range(0, self.world_w, GRID):
-                Rectangle(pos=(x, 0), size=(1, self.world_h))
-            for y in range(0, self.world_h, GRID):
-                Rectangle(pos=(0, y), size=(self.world_w, 1))
+    def _tick(self, dt):
+        if not self._dirty:
+            return
+        self.draw()
 
+    def draw(self):
+        dirty = self._dirty
+        if not dirty.isdisjoint(("walls", "decor", "agents")):
+            c = CULL_CELL
+            cx0, cy0, cx1, cy1 = self._cull_cells = self._view_cells()
+            # Padded so decor details overhanging their rect are kept
+            self._cull_view = (cx0*c - 32, cy0*c - 32, (cx1+1)*c + 32, (cy1+1)*c + 32)
+        if "grid" in dirty:
+            self._rebuild_grid()
+        if "walls" in dirty:
+            self._rebuild_walls()
+        if "decor" in dirty:
+            self._rebuild_decor()
+        if "agents" in dirty:
+            self._rebuild_agents()
+        if "overlay" in dirty:
+            self._rebuild_overlay()
+        dirty.clear()
+
+        # On-canvas status label; only re-rendered when floor or tool change,
+        # so messages like "Saved to ..." stay up until then
+        if not self.status:
+            self.status = Label(text="", font_size=14, color=(1,1,1,1), size_hint=(None,None), pos=(10, 8), markup=True)
+            self.add_widget(self.status)
+            self._status_sig = None
+        sig = (self.current_floor, self.tool)
+        if sig != self._status_sig:
+            self._status_sig = sig
+            self.status.text = f"Floor {floor_label(self.current_floor)}  •  Tool: [b]{self.tool}[/b]  •  Grid: {GRID}px   (Ctrl+S=Save, Ctrl+O=Load, 1..9=Tools)"
+
+    def _rebuild_grid(self):
+        self._grid_canvas.clear()
+        with self._grid_canvas:
+            # Background + grid: one quad tiling the baked grid cell
+            tex = self._grid_tex
+            tex.uvsize = (self.world_w / GRID, self.world_h / GRID)
+            Color(1, 1, 1, 1)
+            Rectangle(pos=(0,0), size=(self.world_w, self.world_h), texture=tex)
+
+    def _rebuild_walls(self):
+        self._walls_canvas.clear()
+        with self._walls_canvas:
             # Walls
             Color(0.25, 0.28, 0.33, 1.0)
+            view = self._cull_view
             for rx,ry,rw,rh in self.walls:
+                if not rect_in_view((rx,ry,rw,rh), view):
+                    continue
                 Rectangle(pos=(rx,ry), size=(rw,rh))
 
-            # Decor
-            for d in self.decor:
-                kind = d["kind"]; rx,ry,rw,rh = d["rect"]
+    def _rebuild_decor(self):
+        self._decor_canvas.clear()
+        view = self._cull_view
+        with self._decor_canvas:
+            # Decor
+            for d in self.decor:
+                if not rect_in_view(d["rect"], view):
+                    continue
+                kind = d["kind"]; rx,ry,rw,rh = d["rect"]
                 if kind == "elevator":
                     Color(0.18, 0.2, 0.24, 1.0)
                     Rectangle(pos=(rx,ry), size=(rw,rh))
@@ -385,32 +571,52 @@ class LevelCanvas(Widget):
                     Color(0.85,0.85,0.85,1.0)
                     Line(ellipse=(rx,ry,rw,rh), width=1)
 
-            # Doors
-            for d in self.doors:
-                rx,ry,rw,rh = d["rect"]
-                sx,sy,sw,sh = d["screen"]
-                r,g,b = COLOR_MAP.get(d.get("color","red"), (0.8,0,0))
-                Color(r,g,b,1.0)
-                Rectangle(pos=(rx,ry), size=(rw,rh))
-                Color(r,g,b,0.3)
-                Rectangle(pos=(sx,sy), size=(sw,sh))
-                Color(1,1,1,0.8)
-                Line(rectangle=(sx,sy,sw,sh), width=1.1)
-
-            # Stairs
-            for r in self.stairs:
-                rx,ry,rw,rh = r["rect"]
-                steps = 6
-                if r["dir"] == "up":
-                    Color(0.8,0.8,0.8,1.0)
-                else:
-                    Color(0.4,0.4,0.4,1.0)
-                Rectangle(pos=(rx,ry), size=(rw,rh))
+            # Doors, batched by colour: one Color per group instead of three
+            # per door; the touchscreen outlines share a single white Color
+            doors_by_color = {}
+            for d in self.doors:
+                if rect_in_view(d["rect"], view) or rect_in_view(d["screen"], view):
+                    doors_by_color.setdefault(d.get("color","red"), []).append(d)
+            for color, doors in doors_by_color.items():
+                r,g,b = COLOR_MAP.get(color, (0.8,0,0))
+                Color(r,g,b,1.0)
+                for d in doors:
+                    rx,ry,rw,rh = d["rect"]
+                    Rectangle(pos=(rx,ry), size=(rw,rh))
+                Color(r,g,b,0.3)
+                for d in doors:
+                    sx,sy,sw,sh = d["screen"]
+                    Rectangle(pos=(sx,sy), size=(sw,sh))
+            if doors_by_color:
+                Color(1,1,1,0.8)
+                for doors in doors_by_color.values():
+                    for d in doors:
+                        Line(rectangle=tuple(d["screen"]), width=1.1)
+
+            # Stairs, batched by direction, then all step lines
+            stairs = [s for s in self.stairs if rect_in_view(s["rect"], view)]
+            ups = [s["rect"] for s in stairs if s["dir"] == "up"]
+            downs = [s["rect"] for s in stairs if s["dir"] != "up"]
+            for shade, group in ((0.8, ups), (0.4, downs)):
+                if group:
+                    Color(shade,shade,shade,1.0)
+                    for rx,ry,rw,rh in group:
+                        Rectangle(pos=(rx,ry), size=(rw,rh))
+            if stairs:
                 Color(0.3,0.3,0.3,1.0)
-                for i in range(steps):
-                    y = ry + (i/steps)*rh
-                    Line(points=[rx, y, rx+rw, y], width=1)
-
+                steps = 6
+                for s in stairs:
+                    rx,ry,rw,rh = s["rect"]
+                    for i in range(steps):
+                        y = ry + (i/steps)*rh
+                        Line(points=[rx, y, rx+rw, y], width=1)
+
+    def _rebuild_agents(self):
+        live = {id(a) for a in self.agents}
+        self._cone_cache = {k: v for k, v in self._cone_cache.items() if k in live}
+        self._agents_canvas.clear()
+        view = self._cull_view
+        with self._agents_canvas:
             # Agent paths + occluded cone preview
             for a in self.agents:
                 ax,ay = a["a"]; bx,by = a["b"]
@@ -420,41 +626,48 @@ class LevelCanvas(Widget):
                 Color(0.9, 0.2, 0.2, 1.0)
                 Rectangle(pos=(ax-6,ay-6), size=(12,12))
                 Rectangle(pos=(bx-6,by-6), size=(12,12))
-                # cone preview
-                fov_half = radians(a.get("fov_deg",60)/2.0)
+                # cone preview, skipped (and not cast) when it can't reach the view
                 cone_len = a.get("cone_len",260)
-                dirx, diry = normalize(bx-ax, by-ay)
-                base_ang = atan2(diry, dirx)
-                start_ang = base_ang + fov_half
-                end_ang = base_ang - fov_half
-                steps = 48
-                pts = []
-                for i in range(steps+1):
-                    t = i/steps
-                    ang = start_ang + (end_ang - start_ang)*t
-                    dx,dy = cos(ang), sin(ang)
-                    hit_pt = None; nearest_d2=None
-                    tx,ty = ax + dx*cone_len, ay + dy*cone_len
-                    for rect in self.walls:
-                        pt = ray_rect_nearest_hit(ax, ay, dx, dy, rect)
-                        if pt is not None:
-                            d2 = (pt[0]-ax)**2 + (pt[1]-ay)**2
-                            if nearest_d2 is None or d2 < nearest_d2:
-                                nearest_d2 = d2; hit_pt = pt
-                    if hit_pt is None:
-                        pts.append((tx,ty))
-                    else:
-                        if nearest_d2 is not None and nearest_d2 > (cone_len*cone_len):
-                            pts.append((tx,ty))
-                        else:
-                            pts.append(hit_pt)
+                if ax+cone_len < view[0] or ax-cone_len > view[2] or ay+cone_len < view[1] or ay-cone_len > view[3]:
+                    continue
                 Color(1.0, 1.0, 0.65, 0.16)
-                verts = [(ax,ay,0,0)] + [(x,y,0,0) for (x,y) in pts]
-                idx = []
-                for i in range(1,len(verts)-1):
-                    idx.extend([0,i,i+1])
-                Mesh(vertices=sum(([vx,vy,0,0] for vx,vy,_,_ in verts), []), indices=idx, mode='triangles')
-
+                self._agents_canvas.add(self._cone_mesh(a))
+
+    def _cone_mesh(self, a):
+        # Persistent triangle_fan mesh for an agent's occluded view cone; its
+        # vertices are only recomputed when the path, fov, cone length or the
+        # walls change
+        ax,ay = a["a"]; bx,by = a["b"]
+        fov_deg = a.get("fov_deg",60); cone_len = a.get("cone_len",260)
+        sig = (ax, ay, bx, by, fov_deg, cone_len, self.walls_version)
+        cached = self._cone_cache.get(id(a))
+        if cached is not None and cached[0] == sig:
+            return cached[1]
+        # noadd: built while the agents canvas is active, but added explicitly
+        mesh = cached[1] if cached is not None else Mesh(mode='triangle_fan', noadd=True)
+        dirx, diry = normalize(bx-ax, by-ay)
+        if dirx == 0 and diry == 0:
+            dirx = 1.0  # degenerate path: face +x
+        # Rotate the facing direction by the cached offsets (angle addition)
+        cos_o, sin_o = cone_offsets(fov_deg, 48)
+        dxs = [dirx*co - diry*so for co, so in zip(cos_o, sin_o)]
+        dys = [diry*co + dirx*so for co, so in zip(cos_o, sin_o)]
+        # All rays against all walls at once (NumPy/Numba when available)
+        pts = cast_rays(ax, ay, dxs, dys, cone_len, self.walls, self.walls_np)
+        # Flat (x, y, u, v) fan: apex then one vertex per ray, with the x/y
+        # slots of a preallocated buffer filled by slice assignment
+        vertices = [0.0] * ((len(pts) + 1) * 4)
+        vertices[0] = ax; vertices[1] = ay
+        vertices[4::4] = [p[0] for p in pts]
+        vertices[5::4] = [p[1] for p in pts]
+        mesh.vertices = vertices
+        mesh.indices = fan_indices(len(pts))
+        self._cone_cache[id(a)] = (sig, mesh)
+        return mesh
+
+    def _rebuild_overlay(self):
+        self._overlay_canvas.clear()
+        with self._overlay_canvas:
             # Start
             if self.current_floor == self.start_floor:
                 Color(0.9, 0.9, 1.0, 1.0)
@@ -483,19 +696,6 @@ class LevelCanvas(Widget):
                 rx,ry,rw,rh = self.pending_door_rect
                 Rectangle(pos=(rx,ry), size=(rw,rh))
 
-            PopMatrix()
-
-            # Toolbar background strip drawn as overlay (for contrast behind buttons)
-            Color(0.05, 0.05, 0.06, 1.0)
-            Rectangle(pos=(0, self.height-52), size=(self.width, 52))
-
-        # On-canvas status label
-        if not self.status:
-            self.status = Label(text="", font_size=14, color=(1,1,1,1), size_hint=(None,None), pos=(10, 8))
-            self.add_widget(self.status)
-        self.status.text = f"Floor {floor_label(self.current_floor)}  •  Tool: [b]{self.tool}[/b]  •  Grid: {GRID}px   (Ctrl+S=Save, Ctrl+O=Load, 1..9=Tools)"
-        self.status.markup = True
-
 class LevelEditorRoot(FloatLayout):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -507,12 +707,22 @@ class LevelEditorRoot(FloatLayout):
 
         # Toolbar
         self.toolbar = BoxLayout(size_hint=(1,None), height=48, pos_hint={"x":0,"top":1})
+        # Background strip (for contrast behind buttons), reaching 4px below
+        # the buttons; only moved when the toolbar is
+        with self.toolbar.canvas.before:
+            Color(0.05, 0.05, 0.06, 1.0)
+            self._toolbar_bg = Rectangle()
+        self.toolbar.bind(pos=self._on_toolbar_layout, size=self._on_toolbar_layout)
         self.add_widget(self.toolbar)
         self._build_toolbar()
 
         # Keyboard shortcuts
         Window.bind(on_key_down=self._on_key_down)
 
+    def _on_toolbar_layout(self, tb, _):
+        self._toolbar_bg.pos = (tb.x, tb.y - 4)
+        self._toolbar_bg.size = (tb.width, tb.height + 4)
+
     def _tool_button(self, name):
         b = Button(text=name, size_hint=(None,1), width=96)
         b.bind(on_release=lambda *_: self._select_tool(name))
@@ -580,6 +790,7 @@ class LevelEditorRoot(FloatLayout):
         self.canvas_view.temp_agent_a = None
         self.canvas_view.pending_door_rect = None
         self.canvas_view.dragging = False
+        self.canvas_view._mark_dirty("overlay")
 
     # Keyboard shortcuts
     def _on_key_down(self, window, key, scancode, codepoint, modifiers):
@@ -601,7 +812,7 @@ class LevelEditorRoot(FloatLayout):
         return False
 
     def _find_levels(self):
-        return sorted([f for f in os.listdir('.') if f.endswith('.json')])
+        return _json_files('.', os.stat('.').st_mtime_ns)
 
     def _update_load_spinner(self):
         if hasattr(self, 'load_spinner'):
@@ -622,6 +833,7 @@ class LevelEditorRoot(FloatLayout):
 
     def _on_color_select(self, spinner, text):
         self.canvas_view.door_color = text
+        self.canvas_view._mark_dirty("overlay")
         self._update_floor_spinner()
 
     def _update_floor_spinner(self):
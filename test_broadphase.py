@@ -0,0 +1,155 @@
+import random
+
+import pytest
+
+from common import broadphase
+from common.broadphase import UniformGrid
+
+
+def rect_overlaps(r, x, y, w, h):
+    rx, ry, rw, rh = r
+    return rx <= x + w and x <= rx + rw and ry <= y + h and y <= ry + rh
+
+
+def segment_hits(r, x0, y0, x1, y1):
+    # Liang-Barsky clip of the segment against the closed rect
+    rx, ry, rw, rh = r
+    t0, t1 = 0.0, 1.0
+    for p, q in ((x0 - x1, x0 - rx), (x1 - x0, rx + rw - x0),
+                 (y0 - y1, y0 - ry), (y1 - y0, ry + rh - y0)):
+        if p == 0:
+            if q < 0:
+                return False
+        else:
+            t = q / p
+            if p < 0:
+                t0 = max(t0, t)
+            else:
+                t1 = min(t1, t)
+    return t0 <= t1
+
+
+def brute_rect_ids(grid, x, y, w, h):
+    return [i for i, r in enumerate(grid.rects) if rect_overlaps(r, x, y, w, h)]
+
+
+def brute_segment_ids(grid, x0, y0, x1, y1):
+    return [i for i, r in enumerate(grid.rects) if segment_hits(r, x0, y0, x1, y1)]
+
+
+def check_rect(grid, x, y, w, h):
+    ids = grid.query_rect_ids(x, y, w, h)
+    assert ids == sorted(set(ids))
+    assert set(brute_rect_ids(grid, x, y, w, h)) <= set(ids)
+    return ids
+
+
+def check_segment(grid, x0, y0, x1, y1):
+    ids = grid.query_segment_ids(x0, y0, x1, y1)
+    assert ids == sorted(set(ids))
+    assert set(brute_segment_ids(grid, x0, y0, x1, y1)) <= set(ids)
+    return ids
+
+
+def random_grid(rng, n, lo=-300, hi=300, cell=64):
+    rects = []
+    for _ in range(n):
+        # Snapped to 4px so many edges land exactly on cell boundaries
+        x = rng.randrange(lo, hi, 4); y = rng.randrange(lo, hi, 4)
+        rects.append((x, y, rng.randrange(0, 160, 4), rng.randrange(0, 160, 4)))
+    return UniformGrid(rects, cell=cell)
+
+
+def test_segment_through_cell_corner():
+    # Rects touching only the corner point (64, 64) the diagonal crosses
+    rects = [(64, 20, 10, 44), (20, 64, 44, 10), (0, 300, 5, 5)] * 4
+    grid = UniformGrid(rects, cell=64)
+    for seg in ((0, 0, 128, 128), (128, 128, 0, 0), (10, 118, 118, 10), (0, 128, 128, 0)):
+        check_segment(grid, *seg)
+    ids = grid.query_segment_ids(0, 0, 128, 128)
+    assert {0, 1} <= set(ids)
+    assert 2 not in ids
+
+
+def test_zero_length_segment():
+    grid = UniformGrid([(0, 0, 64, 64), (64, 64, 10, 10), (-70, -70, 20, 20)] * 4, cell=64)
+    for x, y in ((64, 64), (10, 10), (-60, -60), (500, 500)):
+        check_segment(grid, x, y, x, y)
+    assert grid.query_segment_ids(500, 500, 500, 500) == []
+
+
+def test_axis_parallel_segments():
+    rng = random.Random(1)
+    grid = random_grid(rng, 60)
+    for _ in range(200):
+        a = rng.randrange(-320, 320, 4); b = rng.randrange(-320, 320, 4)
+        c = rng.choice((-128, -64, 0, 64, 128, rng.randrange(-320, 320, 4)))
+        check_segment(grid, a, c, b, c)
+        check_segment(grid, c, a, c, b)
+
+
+def test_random_segments_with_negative_coordinates():
+    rng = random.Random(2)
+    grid = random_grid(rng, 80)
+    for _ in range(500):
+        # Endpoints on cell corners, on cell lines and in between
+        pts = [rng.choice((rng.randrange(-6, 6) * 64, rng.uniform(-400, 400))) for _ in range(4)]
+        check_segment(grid, *pts)
+
+
+def test_rects_spanning_several_cells():
+    grid = UniformGrid([(-200, -10, 400, 20), (-10, -200, 20, 400)] + [(500, 500, 1, 1)] * 8, cell=32)
+    assert set(check_rect(grid, 150, 0, 0, 0)) >= {0}
+    assert set(check_rect(grid, 0, -150, 0, 0)) >= {1}
+    assert set(check_segment(grid, -190, 20, -190, -20)) >= {0}
+    assert 0 not in grid.query_rect_ids(300, 300, 10, 10)
+
+
+def test_random_rect_queries():
+    rng = random.Random(3)
+    grid = random_grid(rng, 80)
+    for _ in range(500):
+        x = rng.uniform(-400, 400); y = rng.uniform(-400, 400)
+        w = rng.choice((0, 0, rng.uniform(0, 200))); h = rng.choice((0, rng.uniform(0, 200)))
+        check_rect(grid, x, y, w, h)
+
+
+def test_query_ray_matches_segment():
+    rng = random.Random(4)
+    grid = random_grid(rng, 40)
+    for _ in range(100):
+        ox = rng.uniform(-300, 300); oy = rng.uniform(-300, 300)
+        dx, dy = rng.choice(((1.0, 0.0), (0.0, -1.0), (0.6, 0.8), (-0.8, 0.6)))
+        d = rng.uniform(0, 400)
+        assert grid.query_ray(ox, oy, dx, dy, d) == [grid.rects[i] for i in check_segment(grid, ox, oy, ox + dx * d, oy + dy * d)]
+
+
+@pytest.mark.parametrize("n", [1, 8, 9, 30])
+def test_min_items_fallback(n):
+    rng = random.Random(n)
+    grid = random_grid(rng, n)
+    assert grid.min_items == 8
+    far_rect = grid.query_rect_ids(5000, 5000, 1, 1)
+    far_seg = grid.query_segment_ids(5000, 5000, 6000, 6000)
+    if n <= grid.min_items:
+        # Small grids skip the cells and hand back everything
+        assert far_rect == far_seg == list(range(n))
+        assert grid.query_rect(5000, 5000, 1, 1) is grid.rects
+    else:
+        assert far_rect == far_seg == []
+    for _ in range(50):
+        check_rect(grid, rng.uniform(-300, 300), rng.uniform(-300, 300), 40, 40)
+        check_segment(grid, *(rng.uniform(-300, 300) for _ in range(4)))
+
+
+def test_boxes_cache():
+    if broadphase.np is None:
+        pytest.skip("NumPy not installed")
+    grid = UniformGrid([(0, 0, 10, 20), (-5, 3, 1, 1)])
+    boxes = grid.boxes
+    assert boxes.shape == (2, 4)
+    assert boxes.tolist() == [[0, 0, 10, 20], [-5, 3, -4, 4]]
+    assert grid.boxes is boxes
+    grid.insert((1, 2, 3, 4))
+    assert grid.boxes.tolist()[-1] == [1, 2, 4, 6]
+    assert UniformGrid().boxes.shape == (0, 4)
@@ -0,0 +1,250 @@
+import importlib
+import os
+import random
+from math import atan2, cos, sin, pi
+
+import pytest
+
+from common import geometry
+from common.broadphase import UniformGrid
+from common.geometry import cast_rays, los_blocked, ray_rect_nearest_hit
+
+
+def reference_rays(ox, oy, dirs_x, dirs_y, max_dist, rects):
+    # Per-ray scalar slab test: nearest hit within max_dist, else the ray's end
+    pts = []
+    for dx, dy in zip(dirs_x, dirs_y):
+        best = max_dist
+        for rect in rects:
+            pt = ray_rect_nearest_hit(ox, oy, dx, dy, rect)
+            if pt is not None:
+                d = ((pt[0] - ox) ** 2 + (pt[1] - oy) ** 2) ** 0.5
+                best = min(best, d)
+        pts.append((ox + dx * best, oy + dy * best))
+    return pts
+
+
+@pytest.fixture(params=["python", "numpy", "numba"])
+def backend(request, monkeypatch):
+    # Force one cast_rays path; the others are patched out
+    if request.param == "python":
+        monkeypatch.setattr(geometry, "np", None)
+    elif request.param == "numpy":
+        if geometry.np is None:
+            pytest.skip("NumPy not installed")
+        monkeypatch.setattr(geometry, "_cast_rays_jit", None)
+    elif geometry._cast_rays_jit is None:
+        pytest.skip("Numba not installed")
+    return request.param
+
+
+def assert_points(got, want):
+    assert len(got) == len(want)
+    for (gx, gy), (wx, wy) in zip(got, want):
+        assert gx == pytest.approx(wx, abs=1e-7)
+        assert gy == pytest.approx(wy, abs=1e-7)
+
+
+def check(ox, oy, dirs, max_dist, rects, **kw):
+    dxs = [d[0] for d in dirs]; dys = [d[1] for d in dirs]
+    got = cast_rays(ox, oy, dxs, dys, max_dist, rects, **kw)
+    assert_points(got, reference_rays(ox, oy, dxs, dys, max_dist, rects))
+    return got
+
+
+AXIS_DIRS = [(1.0, 0.0), (-1.0, 0.0), (0.0, 1.0), (0.0, -1.0)]
+WALLS = [(100, 100, 50, 20), (-80, 40, 30, 200), (20, -90, 200, 10), (0, 0, 10, 10)]
+
+
+def fan(n):
+    return [(cos(2 * pi * i / n), sin(2 * pi * i / n)) for i in range(n)]
+
+
+def test_axis_parallel_rays(backend):
+    for ox, oy in ((5, 110), (125, 50), (-200, 50), (125, -200)):
+        check(ox, oy, AXIS_DIRS, 500, WALLS)
+
+
+def test_origin_inside_rect(backend):
+    got = check(125, 110, AXIS_DIRS + fan(16), 500, WALLS)
+    # From inside, every ray stops on the rect's boundary
+    assert_points(got[:4], [(150, 110), (100, 110), (125, 120), (125, 100)])
+
+
+def test_no_hit_within_max_dist(backend):
+    got = check(300, 300, fan(24), 40, WALLS)
+    for (x, y), (dx, dy) in zip(got, fan(24)):
+        assert x == pytest.approx(300 + dx * 40) and y == pytest.approx(300 + dy * 40)
+
+
+def test_empty_rect_list(backend):
+    got = check(1, 2, AXIS_DIRS, 10, [])
+    assert_points(got, [(11, 2), (-9, 2), (1, 12), (1, -8)])
+
+
+def test_random_scenes(backend):
+    rng = random.Random(5)
+    for _ in range(40):
+        rects = [(rng.uniform(-300, 300), rng.uniform(-300, 300), rng.uniform(1, 120), rng.uniform(1, 120))
+                 for _ in range(rng.randrange(1, 25))]
+        dirs = AXIS_DIRS + fan(rng.randrange(3, 50))
+        check(rng.uniform(-200, 200), rng.uniform(-200, 200), dirs, rng.uniform(10, 600), rects)
+
+
+def test_axis_parallel_rays_on_rect_edges(backend):
+    # (edge - origin) / 0 is 0/0 = NaN on the NumPy path; the parallel-ray
+    # mask must treat an origin on the slab boundary as inside the slab
+    rects = [(100, 100, 50, 20)]
+    for ox, oy in ((100, 50), (150, 50), (100, 110), (125, 100), (125, 120), (50, 100), (50, 120), (99.5, 50)):
+        check(ox, oy, AXIS_DIRS, 500, rects)
+    got = check(100, 50, [(0.0, 1.0)], 500, rects)
+    assert_points(got, [(100, 100)])
+    got = check(99.5, 50, [(0.0, 1.0)], 500, rects)
+    assert_points(got, [(99.5, 550)])
+
+
+def test_precomputed_boxes(backend):
+    rng = random.Random(6)
+    rects = [(rng.uniform(-300, 300), rng.uniform(-300, 300), rng.uniform(1, 120), rng.uniform(1, 120))
+             for _ in range(30)]
+    grid = UniformGrid(rects)
+    dirs = AXIS_DIRS + fan(40)
+    for _ in range(10):
+        ox = rng.uniform(-200, 200); oy = rng.uniform(-200, 200)
+        plain = check(ox, oy, dirs, 400, rects)
+        assert check(ox, oy, dirs, 400, grid.rects, boxes=grid.boxes) == plain
+
+
+def test_los_blocked_corner_touch():
+    # Segments meeting a wall at its corner stay blocked, as with the
+    # original edge-intersection test
+    assert los_blocked(65, 95, 155, 110, [(95, 50, 50, 50)])
+    assert los_blocked(155, 180, 95, 0, [(150, 160, 5, 5)])
+
+
+def import_game():
+    # stealth_golf pulls in Kivy; only the tests that need it import it
+    os.environ.setdefault('KIVY_WINDOW', 'mock')
+    pytest.importorskip('kivy')
+    return importlib.import_module('stealth_golf')
+
+
+def cone_agent(game, x, y, heading, fov_deg, cone_len):
+    a = game.Agent(x, y, x + 1, y, fov_deg=fov_deg, cone_len=cone_len)
+    a.look_dirx, a.look_diry = cos(heading), sin(heading)
+    return a
+
+
+def culled_matches_full(agent, rects):
+    grid = UniformGrid(rects)
+    dirs_x, dirs_y = agent._ray_dirs()
+    full = cast_rays(agent.x, agent.y, dirs_x, dirs_y, agent.cone_len, grid.rects, grid.boxes)
+    kept, boxes = agent._cull_to_cone(grid.rects, grid.boxes, dirs_x, dirs_y)
+    if boxes is not None:
+        assert len(boxes) == len(kept)
+        assert [tuple(b) for b in boxes.tolist()] == [(x, y, x + w, y + h) for x, y, w, h in kept]
+    assert_points(agent._compute_flashlight_polygon_cpu(grid.rects, grid.boxes), full)
+    return kept
+
+
+def test_cone_culling_matches_full_cast():
+    game = import_game()
+    rng = random.Random(7)
+    dropped = 0
+    for _ in range(300):
+        rects = [(rng.uniform(-400, 400), rng.uniform(-400, 400), rng.uniform(1, 150), rng.uniform(1, 150))
+                 for _ in range(rng.randrange(1, 30))]
+        # Headings include the axes, where the corner picks switch sides
+        heading = rng.choice((0, pi / 2, pi, -pi / 2, rng.uniform(-pi, pi)))
+        agent = cone_agent(game, rng.uniform(-100, 100), rng.uniform(-100, 100), heading,
+                           rng.choice((30, 55, 90, 170, 200)), rng.uniform(50, 400))
+        dropped += len(rects) - len(culled_matches_full(agent, rects))
+    assert dropped  # the culler actually removed something
+
+
+def test_cone_culling_everything_culled():
+    # All rects behind the agent: culled to an empty list (and boxes[[]]),
+    # which cast_rays answers with the max-distance fan
+    game = import_game()
+    agent = cone_agent(game, 0, 0, 0.0, 55, 200)
+    rects = [(-150 - 20 * i, -40 + 5 * i, 10, 10) for i in range(12)]
+    assert culled_matches_full(agent, rects) == []
+    dirs_x, dirs_y = agent._ray_dirs()
+    assert_points(agent._compute_flashlight_polygon_cpu(rects),
+                  [(dx * 200, dy * 200) for dx, dy in zip(dirs_x, dirs_y)])
+
+
+def test_cone_culling_keeps_rects_straddling_edges():
+    game = import_game()
+    for heading in (0.0, 0.7, pi / 2, 2.5, pi, -pi / 2, -0.3):
+        agent = cone_agent(game, 10, -20, heading, 55, 300)
+        dirs_x, dirs_y = agent._ray_dirs()
+        # A small box centred on each edge ray, plus one just outside each edge
+        rects = []
+        for i, turn in ((0, 0.2), (-1, -0.2)):
+            ex, ey = dirs_x[i], dirs_y[i]
+            rects.append((10 + ex * 150 - 5, -20 + ey * 150 - 5, 10, 10))
+            ang = atan2(ey, ex) + turn
+            rects.append((10 + cos(ang) * 150 - 5, -20 + sin(ang) * 150 - 5, 10, 10))
+        kept = culled_matches_full(agent, rects)
+        assert rects[0] in kept and rects[2] in kept
+        assert rects[1] not in kept and rects[3] not in kept
+
+
+def reference_collisions(x, y, vx, vy, r, rects):
+    # Ball.update's collision loop before it became _resolve_collisions,
+    # with clamp() and normalize() not yet inlined
+    from common.geometry import clamp, normalize
+    for rx, ry, rw, rh in rects:
+        closest_x = clamp(x, rx, rx + rw)
+        closest_y = clamp(y, ry, ry + rh)
+        dx = x - closest_x; dy = y - closest_y
+        d2 = dx*dx + dy*dy
+        if d2 < r*r:
+            d = d2 ** 0.5 if d2 > 0 else 0.0
+            if d == 0.0:
+                left = abs(x - rx); right = abs((rx + rw) - x)
+                bottom = abs(y - ry); top = abs((ry + rh) - y)
+                m = min(left, right, bottom, top)
+                px, py = (-(r),0) if m==left else ((r),0) if m==right else (0, -(r)) if m==bottom else (0, r)
+            else:
+                nx, ny = dx/d, dy/d
+                push = r - d
+                px, py = nx*push, ny*push
+            x += px; y += py
+            if d2 > 0:
+                nx, ny = normalize(px, py)
+                vn = vx*nx + vy*ny
+                if vn < 0:
+                    vx -= 1.8 * vn * nx
+                    vy -= 1.8 * vn * ny
+    return x, y, vx, vy
+
+
+@pytest.mark.parametrize("state, rects, expected", [
+    # Head-on into a wall's left face: pushed out to x = 100 - 14, vx reflected with 0.8 restitution
+    ((95, 50, 100, 0), [(100, 0, 40, 100)], (86, 50, -80, 0)),
+    # Into the bottom-left corner along the diagonal
+    ((97, -3, 60, 60), [(100, 0, 40, 100)], None),
+    # Centre inside the rect: pushed out through the nearest side, velocity kept
+    ((104, 50, 30, -20), [(100, 0, 40, 100)], (90, 50, 30, -20)),
+    # Beside the right face, within its y span: closest point clamps onto the face
+    ((150, 30, -50, 10), [(100, 0, 40, 100)], (154, 30, 40, 10)),
+    # Level with the top-right corner: closest point clamps to the corner
+    ((148, 106, -10, -10), [(100, 0, 40, 100)], None),
+    # Clear of every rect: untouched
+    ((300, 300, 5, 5), [(100, 0, 40, 100), (0, 0, 10, 10)], (300, 300, 5, 5)),
+    # Wedged between two rects: resolved one after the other
+    ((110, 50, 40, 30), [(90, 0, 10, 100), (112, 40, 50, 20)], None),
+])
+def test_resolve_collisions(state, rects, expected):
+    game = import_game()
+    x, y, vx, vy = state
+    bounds = [(rx, ry, rx + rw, ry + rh) for rx, ry, rw, rh in rects]
+    got = game._resolve_collisions(x, y, vx, vy, 14, bounds)
+    want = reference_collisions(x, y, vx, vy, 14, rects)
+    assert got == pytest.approx(want, abs=1e-9)
+    if expected is not None:
+        assert got == pytest.approx(expected, abs=1e-9)
+    else:
+        assert got != state  # these cases do collide
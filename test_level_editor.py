@@ -0,0 +1,187 @@
+import os
+import random
+import pytest
+
+os.environ['KIVY_WINDOW'] = 'mock'
+kivy = pytest.importorskip('kivy')
+from kivy.core.window import Window
+
+import stealth_golf_level_editor as editor
+from stealth_golf_level_editor import LevelCanvas, GRID
+
+
+class Touch:
+    def __init__(self, x, y):
+        self.x, self.y = x, y
+
+
+KINDS = ("decor", "walls", "stairs", "doors", "agents")
+
+
+def linear_erase(layout, wx, wy):
+    # The Erase priority before the broadphase grids: decor, walls, stairs,
+    # doors, then agent paths, newest first within each kind
+    def inside(r):
+        x, y, w, h = r
+        return x <= wx <= x + w and y <= wy <= y + h
+    def segdist2(ax, ay, bx, by, px, py):
+        vx, vy = bx - ax, by - ay
+        c = vx * (px - ax) + vy * (py - ay); d = vx * vx + vy * vy
+        t = 0 if d == 0 else max(0, min(1, c / d))
+        dx, dy = px - (ax + t * vx), py - (ay + t * vy)
+        return dx * dx + dy * dy
+    tests = {
+        "decor": lambda d: inside(d["rect"]),
+        "walls": inside,
+        "stairs": lambda s: inside(s["rect"]),
+        "doors": lambda d: inside(d["rect"]) or inside(d["screen"]),
+        "agents": lambda a: segdist2(a["a"][0], a["a"][1], a["b"][0], a["b"][1], wx, wy) <= 20 * 20,
+    }
+    for kind in KINDS:
+        items = layout[kind]
+        for i in reversed(range(len(items))):
+            if tests[kind](items[i]):
+                return kind, i
+    return None
+
+
+def coord(rng, lo, hi):
+    # Mix grid-snapped, 64px broadphase cell and arbitrary coordinates so
+    # edges often sit exactly on click positions and cell boundaries
+    return rng.choice((rng.randrange(lo, hi, GRID), rng.randrange(lo, hi, 64), rng.randrange(lo, hi)))
+
+
+def rand_rect(rng):
+    return [coord(rng, -200, 700), coord(rng, -200, 700), rng.choice((GRID, 64, rng.randrange(1, 200))), rng.choice((GRID, 64, rng.randrange(1, 200)))]
+
+
+def random_layout(rng, kinds):
+    n = {k: rng.randrange(9, 30) if k in kinds else 0 for k in KINDS}
+    return {
+        "walls": [rand_rect(rng) for _ in range(n["walls"])],
+        "decor": [{"kind": "rug", "rect": rand_rect(rng)} for _ in range(n["decor"])],
+        "stairs": [{"rect": rand_rect(rng), "dir": "up"} for _ in range(n["stairs"])],
+        "doors": [{"rect": rand_rect(rng), "screen": rand_rect(rng), "color": "red"} for _ in range(n["doors"])],
+        "agents": [{"a": [coord(rng, -200, 700), coord(rng, -200, 700)],
+                    "b": [coord(rng, -200, 700), coord(rng, -200, 700)]} for _ in range(n["agents"])],
+    }
+
+
+def check_erase_matches_linear_scan(kinds, seed):
+    rng = random.Random(seed)
+    canvas = LevelCanvas(size=(900, 1000))
+    canvas.tool = "Erase"
+    for _ in range(15):
+        layout = random_layout(rng, kinds)
+        canvas.floors = [layout]; canvas.current_floor = 0
+        canvas._refresh_floor_refs()
+        expected = {k: list(layout[k]) for k in KINDS}
+        for _ in range(300):
+            # Clicks snap to GRID; multiples of 320 are also 64px cell corners
+            x = rng.choice((rng.randrange(-220, 720), rng.randrange(-320, 960, 320)))
+            y = rng.choice((rng.randrange(-220, 720), rng.randrange(-320, 960, 320)))
+            wx, wy = editor.snap(x), editor.snap(y)
+            hit = linear_erase(expected, wx, wy)
+            if hit is not None:
+                expected[hit[0]].pop(hit[1])
+            canvas.on_touch_down(Touch(x, y))
+            for k in KINDS:
+                got = getattr(canvas, k)
+                assert len(got) == len(expected[k]) and all(a is b for a, b in zip(got, expected[k])), (k, wx, wy)
+
+
+def test_erase_matches_linear_scan():
+    check_erase_matches_linear_scan(("decor", "walls", "agents"), 11)
+
+
+def test_erase_with_stairs_and_doors_matches_linear_scan():
+    check_erase_matches_linear_scan(KINDS, 12)
+
+
+def test_erase_door_by_its_touchscreen():
+    # A door's grid box spans both its rect and its (distant) touchscreen
+    canvas = LevelCanvas(size=(900, 1000))
+    doors = [{"rect": [i * 40, 0, 20, 20], "screen": [i * 40, 600, 20, 20], "color": "red"} for i in range(12)]
+    canvas.floors = [{"walls": [], "decor": [], "stairs": [], "doors": doors, "agents": []}]
+    canvas.current_floor = 0; canvas._refresh_floor_refs()
+    canvas.tool = "Erase"
+    target = doors[5]
+    canvas.on_touch_down(Touch(200, 300))  # between rect and screen: nothing
+    assert len(canvas.doors) == 12
+    canvas.on_touch_down(Touch(200, 620))
+    assert target not in canvas.doors and len(canvas.doors) == 11
+
+
+def test_cone_mesh_cache(monkeypatch):
+    calls = []
+    real_cast = editor.cast_rays
+    def counting_cast(*args):
+        calls.append(args[:2])
+        return real_cast(*args)
+    monkeypatch.setattr(editor, "cast_rays", counting_cast)
+    canvas = LevelCanvas(size=(900, 1000))
+    agent = {"a": [100, 100], "b": [300, 100], "fov_deg": 60, "cone_len": 260}
+    canvas.floors = [{"walls": [], "decor": [], "stairs": [], "doors": [], "agents": [agent]}]
+    canvas.current_floor = 0; canvas._refresh_floor_refs()
+
+    mesh = canvas._cone_mesh(agent)
+    first = list(mesh.vertices)
+    assert len(calls) == 1
+    # Unchanged signature: same mesh, no new cast
+    assert canvas._cone_mesh(agent) is mesh
+    assert len(calls) == 1 and list(mesh.vertices) == first
+
+    # A wall in front of the agent bumps walls_version and shortens the cone
+    version = canvas.walls_version
+    canvas.walls.append([200, -100, 20, 400])
+    canvas._mark_dirty("walls", "agents")
+    assert canvas.walls_version == version + 1
+    assert canvas._cone_mesh(agent) is mesh
+    assert len(calls) == 2
+    blocked = list(mesh.vertices)
+    assert blocked != first and max(blocked[4::4]) == pytest.approx(200)
+
+    # Moving an endpoint re-aims the cone
+    agent["b"] = [100, 300]
+    canvas._cone_mesh(agent)
+    assert len(calls) == 3 and calls[-1] == (100, 100)
+    turned = list(mesh.vertices)
+    assert turned != blocked and min(turned[5::4]) >= 100 - 1e-9
+
+
+def sample_floors():
+    return [
+        {"label": "Rez-de-chaussée", "walls": [[0, 0, 400, 20], [0, 0, 20, 400]],
+         "decor": [{"kind": "plant", "rect": [40, 40, 30.5, 30.25]}],
+         "agents": [{"a": [100, 100], "b": [300.5, 120.75], "speed": 80.5, "fov_deg": 62.5, "cone_len": 260.125}],
+         "stairs": [{"rect": [200, 200, 40, 40], "dir": "up"}],
+         "doors": [{"rect": [60, 0, 40, 20], "screen": [40, 30, 10, 20], "color": "blue", "open": False}]},
+        {"label": "地下 −1 «cave»", "walls": [], "decor": [], "agents": [], "stairs": [],
+         "doors": [{"rect": [1e-3, 2.5e6, 1.0, 0.1], "screen": [0, 0, 1, 1], "color": "white"}]},
+    ]
+
+
+@pytest.mark.parametrize("save_with, load_with", [("orjson", "json"), ("json", "orjson")])
+def test_save_load_interchangeable(tmp_path, monkeypatch, save_with, load_with):
+    orjson = pytest.importorskip("orjson")
+    import json
+    path = str(tmp_path / "level.json")
+    canvas = LevelCanvas(size=(900, 1000))
+    canvas.floors = sample_floors()
+    canvas.start = [60, 80]; canvas.start_floor = 1
+    canvas.hole = {"cx": 120.5, "cy": 340.25, "r": 22}; canvas.hole_floor = 0
+    monkeypatch.setattr(editor, "orjson", orjson if save_with == "orjson" else None)
+    canvas.save_json(path)
+    # Either writer produces plain UTF-8 JSON the stdlib reads back unchanged
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    assert raw["floors"] == sample_floors()
+    assert raw["hole"] == {"cx": 120.5, "cy": 340.25, "r": 22}
+
+    monkeypatch.setattr(editor, "orjson", orjson if load_with == "orjson" else None)
+    loaded = LevelCanvas(size=(900, 1000))
+    assert loaded.load_json(path)
+    assert loaded.floors == sample_floors()
+    assert loaded.start == [60, 80] and loaded.start_floor == 1
+    assert loaded.hole == {"cx": 120.5, "cy": 340.25, "r": 22} and loaded.hole_floor == 0
+    assert (loaded.world_w, loaded.world_h) == (canvas.world_w, canvas.world_h)